@@ -1,5 +1,6 @@
 import stitch.core.utils
 import stitch.core.errors
+import stitch.core.stitch_index
 import stitch.core.stitch_frame
 import stitch.core.stitch_lut
 import stitch.core.stitch_parser
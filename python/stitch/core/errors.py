@@ -27,6 +27,12 @@ class OperatorError(Exception):
 	def __str__(self):
 		return repr(self._value)
 
+class ParseError(Exception):
+	def __init__(self, message):
+		self._message = message
+	def __str__(self):
+		return self._message
+
 class MissingKeywordArgument(Exception):
 	def __init__(self, message):
 		self._message = message
@@ -55,8 +61,8 @@ def main():
 	help(__main__)
 # ------------------------------------------------------------------------------
 
-__all__ = ['NotFound', 'BadArgument', 'OperatorError', 'MissingKeywordArgument',
-		   '_checkKwargs']
+__all__ = ['NotFound', 'BadArgument', 'OperatorError', 'ParseError',
+		   'MissingKeywordArgument', '_checkKwargs']
 
 if __name__ == '__main__':
 	main()
@@ -4,11 +4,15 @@ from functools import *
 import re
 import os
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 import pandas as pd
 from pandas import DataFrame, Series
 import numpy as np
+from pandas.api.types import infer_dtype
 from stitch.core.utils import *
+from stitch.core.errors import *
 from stitch.core.stitch_interpreter import StitchInterpreter
+from stitch.core.stitch_index import create_index, INDEXES
 # ------------------------------------------------------------------------------
 
 '''The stitch_frame module contains the StitchFrame class
@@ -25,6 +29,15 @@ Author:
     Alex Braun <alexander.g.braun@gmail.com> <http://www.AlexBraunVFX.com>
 '''
 
+_INTERPRETER = None
+
+def _get_interpreter():
+    '''Returns the StitchInterpreter shared by all StitchFrames, creating it on first use'''
+    global _INTERPRETER
+    if _INTERPRETER is None:
+        _INTERPRETER = StitchInterpreter()
+    return _INTERPRETER
+
 class StitchFrame(Base):
     '''
     Class for converting stitch data into well-formated, tabular data
@@ -37,6 +50,8 @@ class StitchFrame(Base):
 
     Attributes:
         data (DataFrame): Internal DataFrame where data is actually stored
+        last_search (list): Last stitchql query searched on this StitchFrame
+        indexes (list): (column, kind) pairs of the column indexes used by search
 
     Example:
         >>> data = [[ 'joe',  12, 'mechanic'],
@@ -72,7 +87,9 @@ class StitchFrame(Base):
         Returns:
             StitchFrame
         '''
-        self._interpreter = StitchInterpreter()
+        self._last_search = None
+        self._index_specs = []
+        self._indexes = {}
 
         if type(data) is DataFrame:
             self._data = data
@@ -80,6 +97,30 @@ class StitchFrame(Base):
             self._data = DataFrame(data=data, index=index, columns=columns, dtype=dtype, copy=copy)
     # --------------------------------------------------------------------------
 
+    @property
+    def _data(self):
+        return self._frame
+
+    @_data.setter
+    def _data(self, data):
+        # indexes describe the previous data and are rebuilt when next needed
+        self._frame = data
+        self._indexes = {}
+
+    def __setitem__(self, column, value):
+        '''Sets a column of data, dropping any indexes built on its previous values'''
+        self._data[column] = value
+        self.invalidate_index(column)
+
+    @property
+    def _interpreter(self):
+        return _get_interpreter()
+
+    @property
+    def last_search(self):
+        return self._last_search
+    # --------------------------------------------------------------------------
+
     def applymap(self, func, columns=[], errors=False):
         data = self._data
         func_ = func
@@ -95,18 +136,91 @@ class StitchFrame(Base):
 
         self._data = data
         return self
+
+    def _applymap_by_dtype(self, func, columns=[], errors=False, numeric=None, string=None,
+                           obj=None):
+        '''Semi-private method for applying a function to data column by column
+
+        Numeric columns are given to numeric, columns made only of strings
+        are given to string and all other object columns are given to obj,
+        each of which take and return a whole Series.  All other columns, and
+        any column for which those functions raise, have func applied to them
+        one item at a time, as in applymap.
+
+        Args:
+            func (function): Function to apply to each item.
+            columns (list, optional): Columns to apply it to. Default: all columns.
+            errors (bool, optional): Raise errors from func. Default: False.
+            numeric (function, optional): Function to apply to numeric columns. Default: None.
+            string (function, optional): Function to apply to string columns. Default: None.
+            obj (function, optional): Function to apply to other object columns. Default: None.
+
+        Returns:
+            StitchFrame
+        '''
+        data = self._data
+        func_ = func
+        if errors == False:
+            func_ = lambda x: try_(x, func)
+
+        if isinstance(columns, str):
+            columns = [columns]
+        if len(columns) == 0:
+            positions = range(data.shape[1])
+        else:
+            positions = [i for i, col in enumerate(data.columns) if col in columns]
+        positions = set(positions)
+
+        output = []
+        for i in range(data.shape[1]):
+            series = data.iloc[:, i]
+            if i not in positions:
+                output.append(series)
+                continue
+
+            func__ = None
+            if series.dtype.kind in 'iuf':
+                func__ = numeric
+            elif series.dtype.kind == 'O':
+                func__ = obj
+                if string is not None:
+                    if infer_dtype(series.values) == 'string' and not series.isnull().any():
+                        func__ = string
+
+            result = None
+            if func__ is not None:
+                try:
+                    result = func__(series)
+                except Exception:
+                    pass
+            if result is None:
+                result = series.map(func_)
+            output.append(result)
+
+        if len(output) > 0:
+            output = pd.concat(output, axis=1)
+            output.columns = data.columns
+            data = output
+
+        self._data = data
+        return self
     # --------------------------------------------------------------------------
 
     # math
     def set_decimal_expansion(self, expansion, columns=[], errors=False):
         '''Truncates a float item at specified number of digits after the decimal'''
         func = lambda x: set_decimal_expansion(x, expansion)
-        return self.applymap(func, columns, errors)
+        numeric = lambda x: np.trunc(x.astype(float) * 10 ** expansion) / float(10 ** expansion)
+        return self._applymap_by_dtype(func, columns, errors, numeric=numeric)
 
     def round_to(self, order, columns=[], errors=False):
-        '''Rounds a given number to a given order of magnitudes after the decimal'''
+        '''Rounds a given number to a given order of magnitudes after the decimal
+
+        Numeric columns are rounded to floats, other items to Decimals.
+        '''
         func = lambda x: round_to(x, order)
-        return self.applymap(func, columns, errors)
+        numeric = lambda x: np.round(x.astype(float), order)
+        return self._applymap_by_dtype(func, columns, errors, numeric=numeric)
     # --------------------------------------------------------------------------
 
     # info
@@ -141,19 +255,24 @@ class StitchFrame(Base):
             2   sue  NaN      pilot
             3  jane  NaN    teacher
         '''
-        return self.applymap(is_iterable, columns, errors)
+        numeric = lambda x: Series(False, index=x.index)
+        string = lambda x: Series(True, index=x.index)
+        return self._applymap_by_dtype(is_iterable, columns, errors, numeric=numeric, string=string)
 
     def is_listlike(self, columns=[], errors=False):
         '''Determine if an item id listlike'''
-        return self.applymap(is_listlike, columns, errors)
+        false = lambda x: Series(False, index=x.index)
+        return self._applymap_by_dtype(is_listlike, columns, errors, numeric=false, string=false)
 
     def is_dictlike(self, columns=[], errors=False):
         '''Determine if an item id dictlike'''
-        return self.applymap(is_dictlike, columns, errors)
+        false = lambda x: Series(False, index=x.index)
+        return self._applymap_by_dtype(is_dictlike, columns, errors, numeric=false, string=false)
 
     def is_dict_matrix(self, columns=[], errors=False):
         '''Determine if an item is an iterable of dicts'''
-        return self.applymap(is_dict_matrix, columns, errors)
+        false = lambda x: Series(False, index=x.index)
+        return self._applymap_by_dtype(is_dict_matrix, columns, errors, numeric=false, string=false)
     # --------------------------------------------------------------------------
 
     # coercion
@@ -190,8 +309,24 @@ class StitchFrame(Base):
             2  <type 'str'>  <type 'str'>  <type 'str'>
             3  <type 'str'>  <type 'str'>  <type 'str'>
         '''
+        def _numeric(series):
+            if dtype is int and series.dtype.kind == 'f':
+                # NaN and inf cannot be ints and are left alone
+                if not np.isfinite(series.values).all():
+                    return None
+            if dtype in [int, float, str]:
+                return series.astype(dtype)
+            return None
+
+        def _string(series):
+            if dtype is str:
+                return series
+            if dtype in [int, float]:
+                return series.astype(dtype)
+            return None
+
         func = lambda x: as_type(x, dtype)
-        return self.applymap(func, columns, errors)
+        return self._applymap_by_dtype(func, columns, errors, numeric=_numeric, string=_string)
 
     def as_iterable(self, columns=[], errors=False):
         '''Makes all the elements iterable
@@ -220,9 +355,11 @@ class StitchFrame(Base):
         return self.applymap(func, columns, errors)
 
     def coerce_nulls(self, columns=[], errors=False):
-        # TODO: make this method faster
         '''Coerce all null elements into np.nan
 
+        None, empty strings, empty containers and lists holding only one of
+        those are considered null.
+
         Args:
 
         Returns:
@@ -243,25 +380,62 @@ class StitchFrame(Base):
                 2   sue   65        NaN
                 3   NaN   43    teacher
         '''
-        nulls = [   None,      '',      [],      {},      (),      set(),      OrderedDict(),
-                   [None],    [''],    [[]],    [{}],    [()],    [set()],    [OrderedDict()],
-                   (None),    (''),    ([]),    ({}),    (()),    (set()),    (OrderedDict()),
-                           set(''), set([]), set({}), set(()), set(set()), set(OrderedDict())
-        ]
-
-        def _coerce_nulls(item):
-            if item in nulls:
-                return np.nan
-            else:
-                return item
-
-        func = lambda x: _coerce_nulls(x)
-        return self.applymap(func, columns, errors)
+        containers = (list, tuple, dict, set, frozenset)
+
+        def _is_empty(item):
+            if isinstance(item, str):
+                return item == ''
+            if isinstance(item, containers):
+                return len(item) == 0
+            return item is None
+
+        def _is_null(item):
+            if _is_empty(item):
+                return True
+            return isinstance(item, list) and len(item) == 1 and _is_empty(item[0])
+
+        def _empty(values):
+            # masks of the items which are None, '' or empty and of single item lists
+            codes, types = pd.factorize(np.frompyfunc(type, 1, 1)(values))
+            kinds = lambda x: np.isin(codes, [i for i, t in enumerate(types) if issubclass(t, x)])
+
+            mask = kinds(type(None))
+            strings = kinds(str)
+            mask[strings] = values[strings] == ''
+
+            # containers are judged by their length alone
+            sized = kinds(containers)
+            lengths = np.zeros(len(values), dtype=int)
+            lengths[sized] = np.frompyfunc(len, 1, 1)(values[sized])
+            mask[sized] = lengths[sized] == 0
+            return mask, kinds(list) & (lengths == 1)
+
+        def _object(series):
+            mask, singles = _empty(series.values)
+            mask[singles] = _empty(np.frompyfunc(lambda x: x[0], 1, 1)(series.values[singles]))[0]
+            return series.where(~mask, np.nan)
+
+        # numbers are never null, except NaN which is left alone
+        numeric = lambda x: x
+        string = lambda x: x.where(x != '', np.nan)
+        func = lambda x: np.nan if _is_null(x) else x
+        return self._applymap_by_dtype(func, columns, errors, numeric=numeric, string=string,
+                                       obj=_object)
 
     def as_snakecase(self, columns=[], errors=False):
-        if isinstance(columns, str):
-            columns = [columns]
-        return self.applymap(as_snakecase, columns, errors)
+        def _string(series):
+            for regex, repl in SNAKECASE_SPLITS:
+                series = series.str.replace(regex, repl, regex=True)
+            series = series.str.lower()
+            for regex, repl in SNAKECASE_JOINS:
+                series = series.str.replace(regex, repl, regex=True)
+            return series
+
+        # numbers cannot be snakecased and are left alone
+        numeric = None
+        if errors == False:
+            numeric = lambda x: x
+        return self._applymap_by_dtype(as_snakecase, columns, errors, numeric=numeric, string=_string)
 
     def axis_as_snakecase(self, axis=1):
         self._data.rename_axis(as_snakecase, axis=axis, inplace=True)
@@ -269,6 +443,33 @@ class StitchFrame(Base):
     # --------------------------------------------------------------------------
 
     # regex
+    @staticmethod
+    def _regex_groups(series, pattern, flags=0, match=False):
+        '''Semi-private method for finding the groups of a regex in a string Series
+
+        Args:
+            series (Series): Series of strings.
+            pattern (str): Regular expression pattern.
+            flags (int, optional): Regular expression flags. Default: 0.
+            match (bool, optional): Only match at the start of each string. Default: False.
+
+        Returns:
+            DataFrame of groups, the first of which is the whole match, and
+            the compiled regular expression the groups are numbered by, or
+            None if the pattern refers to groups by number
+        '''
+        # the whole match is found by wrapping the pattern in a group, which
+        # would renumber the groups that numbered backreferences point to
+        if NUMBERED_REFERENCE.search(pattern):
+            return None
+
+        pattern = '(' + pattern + ')'
+        if match:
+            pattern = r'\A' + pattern
+        regex = compile_regex(pattern, flags)
+        groups = series.str.extract(regex, expand=True)
+        return groups, regex
+
     def regex_match(self, pattern, group=0, ignore_case=False, columns=[], errors=False):
         # May be deprecated in favor of search
         '''Apply regular expression matches to all DataFrame elements
@@ -297,7 +498,8 @@ class StitchFrame(Base):
             3  jane   43    teacher
         '''
         func = lambda x: regex_match(pattern, x, group=group, ignore_case=ignore_case)
-        return self.applymap(func, columns, errors)
+        string = lambda x: self._regex_group(x, pattern, group, ignore_case, match=True)
+        return self._applymap_by_dtype(func, columns, errors, numeric=lambda x: x, string=string)
 
     def regex_search(self, pattern, group=0, ignore_case=False, columns=[], errors=False):
         # May be deprecated in favor of search
@@ -327,7 +529,27 @@ class StitchFrame(Base):
             3  jane   43    teacher
         '''
         func = lambda x: regex_search(pattern, x, group=group, ignore_case=ignore_case)
-        return self.applymap(func, columns, errors)
+        string = lambda x: self._regex_group(x, pattern, group, ignore_case)
+        return self._applymap_by_dtype(func, columns, errors, numeric=lambda x: x, string=string)
+
+    def _regex_group(self, series, pattern, group, ignore_case, match=False):
+        '''Semi-private method for vectorized regex_match and regex_search'''
+        flags = re.IGNORECASE if ignore_case else 0
+        groups = self._regex_groups(series, pattern, flags=flags, match=match)
+        if groups is None:
+            return None
+        groups, regex = groups
+        if isinstance(group, int):
+            group += 1
+        else:
+            group = regex.groupindex[group]
+
+        found = groups.iloc[:, 0].notnull().values
+        output = groups.iloc[:, group - 1].values.astype(object)
+        # groups which take no part in a match are None
+        output[found & pd.isnull(output)] = None
+        output = np.where(found, output, series.values)
+        return Series(output, index=series.index, name=series.name)
 
     def regex_sub(self, pattern, repl, count=0, ignore_case=False, columns=[], errors=False):
         '''Apply regular expression substitutions to all DataFrame elements
@@ -357,8 +579,13 @@ class StitchFrame(Base):
             2   sue   65                pilot
             3  jane   43              teacher
         '''
+        def _string(series):
+            flags = re.IGNORECASE if ignore_case else 0
+            regex = compile_regex(pattern, flags)
+            return series.str.replace(regex, repl, n=count or -1, regex=True)
+
         func = lambda x: regex_sub(pattern, repl, x, count=count, ignore_case=ignore_case)
-        return self.applymap(func, columns, errors)
+        return self._applymap_by_dtype(func, columns, errors, numeric=lambda x: x, string=_string)
 
     def regex_split(self, pattern, ignore_case=False, columns=[], errors=False):
         '''Splits elements into list of found regular expression groups
@@ -386,8 +613,22 @@ class StitchFrame(Base):
             2   sue   65     [helicopter, pilot]
             3  jane   43                 teacher
         '''
+        def _string(series):
+            flags = re.IGNORECASE if ignore_case else 0
+            regex = compile_regex(pattern, flags)
+
+            # str.extract returns NaN for groups which take no part in a
+            # match, so the groups are taken from the matches themselves
+            matches = list(map(regex.search, series.values))
+            found = np.array([x is not None for x in matches], dtype=bool)
+            groups = [list(x.groups()) for x in matches if x is not None]
+
+            output = series.values.copy()
+            output[found] = Series(groups, dtype=object).values
+            return Series(output, index=series.index, name=series.name)
+
         func = lambda x: regex_split(pattern, x, ignore_case=ignore_case)
-        return self.applymap(func, columns, errors)
+        return self._applymap_by_dtype(func, columns, errors, numeric=lambda x: x, string=_string)
     # --------------------------------------------------------------------------
 
     # internal reshape
@@ -414,12 +655,42 @@ class StitchFrame(Base):
             2   sue   43        NaN
             3   NaN  NaN        NaN
         '''
-        func = lambda x: nan_to_bottom()
-        return self.applymap(func, columns, errors)
+        data = self._data
+        if isinstance(columns, str):
+            columns = [columns]
+        positions = range(data.shape[1])
+        if len(columns) > 0:
+            positions = [i for i, col in enumerate(data.columns) if col in columns]
+
+        output = {}
+        for i in range(data.shape[1]):
+            output[i] = data.iloc[:, i].values
+
+        # a stable sort of the null mask moves the nulls down and keeps the
+        # order of everything else
+        mask = np.zeros((data.shape[0], len(positions)), dtype=bool)
+        for j, i in enumerate(positions):
+            mask[:, j] = pd.isnull(output[i])
+        order = np.argsort(mask, axis=0, kind='mergesort')
+
+        for j, i in enumerate(positions):
+            values = output[i].take(order[:, j])
+            if values.dtype.kind == 'O':
+                values[mask[order[:, j], j]] = np.nan
+            output[i] = values
+
+        output = DataFrame(output, index=data.index, columns=range(data.shape[1]))
+        output.columns = data.columns
+        self._data = output
+        return self
 
     def unique(self):
         '''Returns a DataFrame of unique values, excluding np.nans
 
+        Each column lists its distinct values in order of first appearance,
+        padded with NaN to the length of the longest.  Columns keep their
+        dtype unless padded, when integers become floats.
+
         Args:
 
         Returns:
@@ -440,12 +711,33 @@ class StitchFrame(Base):
             2   fiat  truck   NaN   NaN
         '''
         data = self._data
-        mask = data.apply(lambda x: x.duplicated())
-        data[mask] = np.nan
-        data = data.apply(lambda x: nan_to_bottom(x))
-        data = data.dropna(how='all')
 
-        self._data = data
+        # factorize lists the distinct items of a column in order of appearance
+        uniques = []
+        for i in range(data.shape[1]):
+            uniques.append(pd.factorize(data.iloc[:, i].values)[1])
+        size = max([len(x) for x in uniques] + [0])
+
+        output = {}
+        for i, values in enumerate(uniques):
+            values = np.asarray(values)
+            if len(values) < size:
+                kind = values.dtype.kind
+                if kind in 'fMm':
+                    dtype = values.dtype
+                elif kind in 'iu':
+                    dtype = float
+                else:
+                    dtype = object
+                padded = np.empty(size, dtype=dtype)
+                padded[len(values):] = np.nan if kind not in 'Mm' else np.datetime64('NaT')
+                padded[:len(values)] = values
+                values = padded
+            output[i] = values
+
+        output = DataFrame(output, index=data.index[:size], columns=range(data.shape[1]))
+        output.columns = data.columns
+        self._data = output
         return self
 
     def invert(self, columns=[], errors=False):
@@ -509,12 +801,22 @@ class StitchFrame(Base):
     # --------------------------------------------------------------------------
 
     # external reshape
-    def flatten(self, columns=[], prefix=True, drop=True, dtype=dict, inplace=True):
+    def flatten(self, columns=[], prefix=True, drop=True, dtype=dict, inplace=True, depth=1):
         '''Split items of iterable elements into separate columns
 
         Args:
-            dtype (type, optional): Columns types to be split. Default: dict
+            columns (list, optional): Columns to be split, whatever the type of
+                their dicts, lists and tuples. Default: all columns with items of dtype
             prefix (bool, optional): Append original column name as a prefix to new columns
+            drop (bool, optional): Drop the columns which are split. Default: True
+            dtype (type or list, optional): Type or types of the items to be
+                split. Default: dict
+            inplace (bool, optional): Place new columns where the columns they
+                were split from were. Default: True
+            depth (int or str, optional): Number of nested levels to split, or
+                'all'.  Columns split from a column are split again if they
+                have items of dtype, as if flatten were called depth times.
+                Default: 1
 
         Returns:
             Flattened DataFrame
@@ -532,71 +834,160 @@ class StitchFrame(Base):
             0       1       10     some string
             1       2       20  another string
             2       3       30            blah
-        '''
-        if isinstance(columns, str):
-            columns = [columns]
 
-        def _reorder_columns(columns, index):
-            new_cols = []
-            for col in columns:
-                if col in index:
-                    if not drop:
-                        new_cols.append(col)
-                    new_cols.extend( index[col] )
-                else:
-                    new_cols.append(col)
-            return new_cols
+            >>> print(sf.data)
+                                        foo
+            0  {u'a': {u'x': 1}, u'b': 10}
+            1  {u'a': {u'x': 2}, u'b': 20}
 
-        col_index = OrderedDict()
-        def _flatten(data, columns):
-            for col in columns:
-                col_index[col] = []
-            frames = []
-            for col in columns:
-                frame = DataFrame(data[col].tolist())
-                if prefix:
-                    columns = {}
-                    for k in frame.columns:
-                        columns[k] = str(col) + '_' + str(k)
-                    frame.rename(columns=columns, inplace=True)
-                frames.append(frame)
-                col_index[col].extend( frame.columns.tolist() )
-            data = pd.concat(frames, axis=1)
-            return data
+            >>> sf.flatten(depth='all')
+            >>> print(sf.data)
+               foo_a_x  foo_b
+            0        1     10
+            1        2     20
+        '''
+        if depth == 'all':
+            depth = float('inf')
+        if (not isinstance(depth, int) and depth != float('inf')) or depth < 1:
+            raise BadArgument('depth must be a positive integer or all, not ' + str(depth))
 
+        if isinstance(columns, str):
+            columns = [columns]
+        columns = list(columns)
+        dtypes = tuple(as_iterable(dtype))
         data = self._data
-        flatdata = data
-        old_cols = data.columns.tolist()
 
-        # determine flatenable columns via column mask
-        if columns:
-            flatdata = flatdata[columns]
-        else:
-            mask = data.applymap(lambda x: bool_test(type(x), '==', dtype))
-            iterables = data[mask]
-            iterables = iterables.dropna(how='all', axis=1)
-            columns = iterables.columns.tolist()
+        # determine flatenable columns via a scan of their item types
+        splittable = lambda x: isinstance(x, (dict, list, tuple))
+        if not columns:
+            splittable = lambda x: type(x) in dtypes
+            for col in data.columns:
+                series = data[col]
+                if series.dtype.kind != 'O':
+                    continue
+                for item in series.values:
+                    if splittable(item):
+                        columns.append(col)
+                        break
+
+        if not columns:
+            return self
 
-        # Get right-hand flattened columns
-        flatdata = _flatten(flatdata, columns)
+        # split each column into a frame with a single pass over its items
+        col_index = OrderedDict()
+        frames = []
+        for col in columns:
+            frame = self._split_column(data[col], splittable, dtypes, depth, prefix, drop)
+            frames.append(frame)
+            col_index[col] = frame.columns.tolist()
 
         old_cols = data.columns.tolist()
 
         # drop original columns
         if drop:
-            data = data.T.drop(columns).T
+            data = data.drop(columns, axis=1)
 
         # attach right-hand flattened columns to  original columns
-        data = pd.concat([data, flatdata], axis=1)
+        data = pd.concat([data] + frames, axis=1)
 
         # reorganize columns
         if inplace:
-            cols = _reorder_columns(old_cols, col_index)
+            cols = []
+            for col in old_cols:
+                if col in col_index:
+                    if not drop:
+                        cols.append(col)
+                    cols.extend(col_index[col])
+                else:
+                    cols.append(col)
             data = data[cols]
 
         self._data = data
         return self
 
+    @staticmethod
+    def _split_column(series, splittable, dtypes, depth, prefix, drop):
+        '''Semi-private method for splitting a column into a frame for flatten
+
+        Every item is traversed once, down to depth levels.  Nested items are
+        split if they are of one of dtypes.  Paths which are split in any row
+        are dropped if drop is True, as flatten drops columns with any item of
+        dtype.
+
+        Args:
+            series (Series): Column to split.
+            splittable (function): Test for splitting the items of the column.
+            dtypes (tuple): Types of nested items to split.
+            depth (int): Number of levels to split.
+            prefix (bool): Prefix new columns with the names of their parents.
+            drop (bool): Drop split columns.
+
+        Returns:
+            DataFrame
+        '''
+        if depth == 1:
+            rows = []
+            for item in series.values:
+                if not splittable(item):
+                    item = {}
+                elif not isinstance(item, dict):
+                    item = dict(enumerate(item))
+                rows.append(item)
+
+            frame = DataFrame(rows, index=series.index)
+            if prefix:
+                frame.columns = [str(series.name) + '_' + str(k) for k in frame.columns]
+            return frame
+
+        # paths are numbered so that columns are ordered depth first,
+        # in the order their keys first appear
+        tree = OrderedDict()
+        paths = {}
+        split = set()
+
+        def _split(item, path, node, level, row):
+            if isinstance(item, dict):
+                items = item.items()
+            else:
+                items = enumerate(item)
+
+            for key, val in items:
+                path_ = path + (key,)
+                if path_ not in paths:
+                    paths[path_] = len(paths)
+                child = node.setdefault(key, OrderedDict())
+
+                if level < depth and type(val) in dtypes:
+                    split.add(path_)
+                    if not drop:
+                        row[paths[path_]] = val
+                    _split(val, path_, child, level + 1, row)
+                else:
+                    row[paths[path_]] = val
+
+        rows = []
+        for item in series.values:
+            row = {}
+            if splittable(item):
+                _split(item, (), tree, 1, row)
+            rows.append(row)
+
+        order = []
+        def _order(node, path):
+            for key, child in node.items():
+                path_ = path + (key,)
+                if not drop or path_ not in split:
+                    order.append(path_)
+                _order(child, path_)
+        _order(tree, ())
+
+        frame = DataFrame(rows, index=series.index, columns=[paths[x] for x in order])
+        if prefix:
+            frame.columns = ['_'.join([str(series.name)] + [str(k) for k in x]) for x in order]
+        else:
+            frame.columns = [x[-1] for x in order]
+        return frame
+
     def stack_by_column(self, column):
         '''Stacks data according to chunks demarcated by unique elements within
         a given column
@@ -628,39 +1019,32 @@ class StitchFrame(Base):
             1  NaN        NaN    25  policeman   14    student    43    teacher
             2  NaN        NaN   NaN        NaN   44      nurse   NaN        NaN
         '''
-        frames = []
-        max_len = 0
-        cols = list(self._data.columns.drop(column))
-        grps = self._data.groupby(column)
-
-        for item in self._data[column].unique():
-            group = grps.get_group(item)
-            group = group[cols]
-            group.columns = [[item] * len(cols), cols]
-            frames.append(group)
-
-            if len(group) > max_len:
-                max_len = len(group)
-
-        for frame in frames:
-            bufr = frame.head(1)
-            bufr = bufr.apply(lambda x: np.nan)
+        data = self._data
+        cols = list(data.columns.drop(column))
+        data = data[data[column].notnull()]
+        keys = data[column]
 
-            buf_len = max_len - len(frame)
-            for i in range(buf_len):
-                bufr.append(bufr)
-            frame.append(bufr, ignore_index=True)
-            frame.reset_index(drop=True)
+        # number the rows of each chunk and pivot the chunks into columns
+        position = keys.groupby(keys.values).cumcount()
+        data = data[cols]
+        data.index = pd.MultiIndex.from_arrays([position.values, keys.values])
+        data = data.unstack(level=1)
 
-        data = pd.concat(frames, axis=1)
+        # order columns by chunk, in order of first appearance
+        data.columns = data.columns.swaplevel(0, 1)
+        data = data[[(key, col) for key in keys.unique() for col in cols]]
+        data.columns.names = [None, None]
+        data.index = pd.RangeIndex(len(data))
 
         self._data = data
         return self
 
-    def unstripe(self):
+    def unstripe(self, preallocate=False):
         '''Reduced striped DataFrame into DataFrame with unique columns
 
         Args:
+            preallocate (bool, optional): Build the result in a single
+                preallocated array if all columns share a dtype. Default: False
 
         Returns:
             Unstriped DataFrame
@@ -682,29 +1066,30 @@ class StitchFrame(Base):
             6  jane    teacher
             7   NaN        NaN
         '''
-        data = self._data.reset_index(level=1, drop=True)
+        data = self._data
+        if data.index.nlevels > 1:
+            data = data.reset_index(level=1, drop=True)
 
-        new_cols = data.columns.unique().tolist()
-        cols = Series(data.columns)
-        mask = cols.duplicated()
-        bad_cols = cols[mask].tolist()
-        good_cols = set(cols.unique()).difference(bad_cols)
+        # positions of each column name
+        positions = OrderedDict()
+        for i, col in enumerate(data.columns):
+            positions.setdefault(col, []).append(i)
 
         items = []
-        for col in new_cols:
-            if col in bad_cols:
-                item = data[col].unstack()
-                item = Series(item.values)
-                items.append(item)
+        for col, pos in positions.items():
+            if len(pos) > 1:
+                # stripes are stacked one after another
+                item = data.iloc[:, pos].values.ravel(order='F')
+                items.append(Series(item))
             else:
-                items.append(data[col])
+                items.append(data.iloc[:, pos[0]])
 
-        self.concat_irregular(items, axis=1, ignore_index=False)
-        self._data.columns = new_cols
+        self.concat_irregular(items, axis=1, ignore_index=True, preallocate=preallocate)
+        self._data.columns = list(positions.keys())
         return self
 
     def merge_columns(self, columns, func='default', new_column='default',
-                    iterables=False, drop=False):
+                    iterables=False, drop=False, raw=False):
         '''Merge columns according to supplied or default function
 
         Args:
@@ -713,6 +1098,8 @@ class StitchFrame(Base):
             new_column (str optional): Name of merged column. Default: a_b...
             iterables (bool optional): True if any column contains an iterable. Default: False
             drop (bool optional): Drop columns to be merged. Default: False
+            raw (bool optional): Pass func each row as a tuple rather than a
+                Series, which is much faster. Default: False
 
         Example:
             >>> print(sf.data)
@@ -748,33 +1135,40 @@ class StitchFrame(Base):
             2      harry    harmon   27  {u'2nd': u'chemist', u'1st': u'teacher'}
             3        sue     marie   78      {u'2nd': u'baker', u'1st': u'nurse'}
 
+            >>> print(sf.merge_columns(['job_1', 'job_2'],)
+                func=lambda x: '/'.join(filter(None, x)),
+                new_column='jobs', drop=True, raw=True)
+              first_name last_name  age            jobs
+            0       john   jenkins   23           pilot
+            1       jane     smith   46         surgeon
+            2      harry    harmon   27  teacher/chemist
+            3        sue     marie   78     nurse/baker
+
         Returns:
             DataFrame
         '''
         if isinstance(columns, str):
             columns = [columns]
 
-        def _add(item):
-            output = item[item.index[0]]
-            for i, col in enumerate(columns[1:]):
-                output += item[item.index[i + 1]]
-            return output
-
-        def _append(item):
-            output = []
-            for i, col in enumerate(columns):
-                output.append(item[item.index[i]])
-            return output
+        data = self._data.copy()
+        items = data[columns]
 
         if func == 'default':
-            func = _add
             if iterables:
-                func = _append
+                # append
+                result = [list(x) for x in zip(*[items.iloc[:, i].values for i in range(len(columns))])]
+            else:
+                # add
+                result = items.iloc[:, 0]
+                for i in range(1, len(columns)):
+                    result = result + items.iloc[:, i]
+        elif raw:
+            result = [func(x) for x in items.itertuples(index=False, name=None)]
+        else:
+            result = [func(x) for i, x in items.iterrows()]
 
-        data = self._data.copy()
-        result = data[columns]
-        result = result.T.apply(lambda x: [func(x)]).T
-        result = result.apply(lambda x: x[0])
+        if not isinstance(result, Series):
+            result = Series(result, index=data.index)
 
         col = '_'.join([str(x) for x in columns])
         if new_column != 'default':
@@ -868,34 +1262,77 @@ class StitchFrame(Base):
         return self
 
     def get_revolutions(self, start=None, stop=None):
-        def _get_revolutions(left, right):
-            output = []
-            for l in left:
-                for r in right:
-                    temp = [l]
-                    if isinstance(l, list):
-                        temp = copy(l)
-                    temp.append(r)
-                    output.append(temp)
-            return output
+        '''Generates every combination of the items of each column
 
-        cols = self._data.columns.tolist()
-        data = self._data[cols[0]].dropna().tolist()
-        for col in cols[1:]:
-            data = _get_revolutions(data, self._data[col].dropna().tolist())
-        data = DataFrame(data, columns=cols)
+        Combinations are ordered like an odometer, with the last column
+        revolving fastest.  Only the requested slice is generated.
 
-        if start:
-            start = data.T.apply(lambda x: ''.join(x.tolist()) == start).T
-            start = data[start].index.values[0]
-            data = data.ix[start:]
+        Args:
+            start (str or int, optional): First combination to return, given
+                as its items joined into a string or as its position. Default: None
+            stop (str or int, optional): Last combination to return, given
+                as its items joined into a string or as its position. Default: None
 
-        if stop:
-            stop = data.T.apply(lambda x: ''.join(x.tolist()) == stop).T
-            stop = data[stop].index.values[0]
-            data = data.ix[:stop]
+        Returns:
+            DataFrame of combinations, indexed by position
 
-        data.reset_index(drop=True)
+        Example:
+            >>> print(sf.data)
+              shot layer
+            0  s01    bg
+            1  s02    fg
+            2  NaN    fx
+
+            >>> print(sf.get_revolutions(start='s01fx', stop='s02fg'))
+              shot layer
+            2  s01    fx
+            3  s02    bg
+            4  s02    fg
+        '''
+        cols = self._data.columns.tolist()
+        values = [self._data[col].dropna().values for col in cols]
+
+        # the number of positions each column advances by
+        sizes = [len(x) for x in values]
+        strides = [int(np.prod(sizes[i + 1:])) for i in range(len(sizes))]
+        total = int(np.prod(sizes))
+
+        def _positions(string):
+            # depth first search of the combinations whose items join into string
+            def _search(i, remainder, position):
+                if i == len(values):
+                    if remainder == '':
+                        yield position
+                    return
+                for j, item in enumerate(values[i]):
+                    item = str(item)
+                    if remainder.startswith(item):
+                        for x in _search(i + 1, remainder[len(item):], position + j * strides[i]):
+                            yield x
+            return _search(0, string, 0)
+
+        def _resolve(item, minimum):
+            if isinstance(item, (int, np.integer)):
+                if not minimum <= item < total:
+                    raise NotFound('Position not found: ' + str(item))
+                return int(item)
+            for position in _positions(item):
+                if position >= minimum:
+                    return position
+            raise NotFound('Combination not found: ' + str(item))
+
+        first = 0
+        last = total - 1
+        if start is not None:
+            first = _resolve(start, 0)
+        if stop is not None:
+            last = _resolve(stop, first)
+
+        positions = np.arange(first, last + 1)
+        data = OrderedDict()
+        for col, vals, size, stride in zip(cols, values, sizes, strides):
+            data[col] = vals[(positions // stride) % size]
+        data = DataFrame(data, index=positions, columns=cols)
 
         self._data = data
         return self
@@ -905,9 +1342,17 @@ class StitchFrame(Base):
     def to_dataframe(self):
         return self._data
 
-    def concat_irregular(self, items, axis=0, ignore_index=True):
+    def concat_irregular(self, items, axis=0, ignore_index=True, preallocate=False):
         '''Concatenate DataFrames of different dimensions
 
+        Args:
+            items (list): DataFrames and Series to concatenate.
+            axis (int, optional): Axis to concatenate along. Default: 0
+            ignore_index (bool, optional): Align items by position rather than
+                by index when concatenating columns. Default: True
+            preallocate (bool, optional): Concatenate columns into a single
+                preallocated array if all items share a dtype. Default: False
+
         Example:
             >>> x = DataFrame(np.arange(0, 9).reshape(3, 3))
             >>> y = DataFrame(np.arange(100, 116).reshape(4, 4))
@@ -918,24 +1363,69 @@ class StitchFrame(Base):
             2   6   7   8  108  109  110  111
             3 NaN NaN NaN  112  113  114  115
         '''
-        max_len = 0
-        for item in items:
-            if len(item) > max_len:
-                max_len = len(item)
+        if axis not in [1, 'columns'] or not ignore_index:
+            self._data = pd.concat(items, axis=axis)
+            return self
 
-        for item in items:
-            bufr = item.head(1)
-            bufr = bufr.apply(lambda x: np.nan)
-            buf_len = max_len - len(item)
-            for i in range(buf_len):
-                if ignore_index:
-                    item.append(bufr, ignore_index=ignore_index)
-                else:
-                    item.append(bufr)
+        max_len = max([len(x) for x in items])
+
+        if preallocate:
+            data = self._preallocated_concat(items, max_len)
+            if data is not None:
+                self._data = data
+                return self
 
-        self._data = pd.concat(items, axis=axis)
+        index = pd.RangeIndex(max_len)
+        items = [x.reset_index(drop=True).reindex(index) for x in items]
+        self._data = pd.concat(items, axis=1)
         return self
 
+    @staticmethod
+    def _preallocated_concat(items, max_len):
+        '''Semi-private method for concatenating columns into a single array
+
+        Args:
+            items (list): DataFrames and Series to concatenate.
+            max_len (int): Length of the longest item.
+
+        Returns:
+            DataFrame or None if the items do not share a dtype
+        '''
+        dtypes = set()
+        for item in items:
+            if isinstance(item, Series):
+                dtypes.add(item.dtype)
+            else:
+                dtypes.update(item.dtypes.tolist())
+        if len(dtypes) != 1:
+            return None
+
+        dtype = dtypes.pop()
+        if any([len(x) < max_len for x in items]):
+            # padding is NaN
+            if dtype.kind not in 'biufcO':
+                return None
+            dtype = np.result_type(dtype, np.float64)
+
+        width = sum([1 if isinstance(x, Series) else x.shape[1] for x in items])
+        data = np.empty((max_len, width), dtype=dtype)
+        if dtype.kind in 'fcO':
+            data.fill(np.nan)
+
+        columns = []
+        j = 0
+        for i, item in enumerate(items):
+            if isinstance(item, Series):
+                data[:len(item), j] = item.values
+                columns.append(i if item.name is None else item.name)
+                j += 1
+            else:
+                data[:len(item), j:j + item.shape[1]] = item.values
+                columns.extend(item.columns.tolist())
+                j += item.shape[1]
+
+        return DataFrame(data, columns=columns)
+
     def concat_hierarchical(self, items):
         '''Concatenates multiple DataFrames with hierarchical indexes
 
@@ -997,48 +1487,312 @@ class StitchFrame(Base):
         self._data = output
         return self
 
-    def from_walk(self, source, aggregate=False, skip_regex='\.DS_Store'):
+    @staticmethod
+    def _scan_directory(root, skip):
+        '''Semi-private method for listing the subdirectories and files of a directory
+
+        Symbolic links to directories are neither files nor followed, as in
+        os.walk.
+
+        Args:
+            root (str): Directory to scan.
+            skip (regex): Compiled regular expression of filenames to skip.
+
+        Returns:
+            tuple: list of subdirectory paths and list of file DirEntries, or
+                None if the directory cannot be scanned
+        '''
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            return None
+
+        dirs = []
+        files = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                if not entry.is_symlink():
+                    dirs.append(entry.path)
+            elif not skip.search(entry.name):
+                files.append(entry)
+        return dirs, files
+
+    @staticmethod
+    def _walk_index(root):
+        '''Semi-private method for splitting a directory into from_walk keys'''
+        return list(filter(lambda x: x != '', re.split(os.sep, root)))
+
+    def _walk_files(self, source, skip_regex):
+        '''Semi-private generator of the files beneath a directory
+
+        Directories are scanned with os.scandir, in the same top-down order as
+        os.walk.  Directories which cannot be scanned are skipped.
+
+        Args:
+            source (str): Directory to walk.
+            skip_regex (str): Regular expression of filenames to skip.
+
+        Yields:
+            tuple: Path components of the file's directory and its DirEntry
+        '''
+        skip = compile_regex(skip_regex)
+        stack = [source]
+        while stack:
+            root = stack.pop()
+            scan = self._scan_directory(root, skip)
+            if scan is None:
+                continue
+
+            dirs, files = scan
+            ind = self._walk_index(root)
+            for entry in files:
+                yield ind, entry
+            stack.extend(reversed(dirs))
+
+    def _walk_incremental(self, source, skip_regex, threads, xattrs, known):
+        '''Semi-private method for walking a directory against a previous snapshot
+
+        Every directory is stated, but only those whose mtime differs from
+        the snapshot are scanned, and only their files stated.
+
+        Args:
+            source (str): Directory to walk.
+            skip_regex (str): Regular expression of filenames to skip.
+            threads (int): Number of threads collecting stat and xattr data.
+            xattrs (bool): Collect xattrs.
+            known (dict): Directories of previous snapshot.
+
+        Returns:
+            tuple: OrderedDict of directories by path, each a dict of mtime,
+                dirs and files, and list of the paths of changed directories
+        '''
+        skip = compile_regex(skip_regex)
+        directories = OrderedDict()
+        changed = []
+        pending = []
+        stack = [source]
+        while stack:
+            root = stack.pop()
+            try:
+                mtime = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+
+            item = known.get(root)
+            if item is None or item['mtime'] != mtime:
+                scan = self._scan_directory(root, skip)
+                if scan is None:
+                    continue
+                item = dict(mtime=mtime, dirs=scan[0], files=scan[1])
+                changed.append(root)
+                pending.append(root)
+
+            directories[root] = item
+            stack.extend(reversed(item['dirs']))
+
+        entries = []
+        for root in pending:
+            entries.extend(directories[root]['files'])
+
+        func = partial(self._walk_datum, xattrs=xattrs)
+        if threads > 1:
+            pool = ThreadPool(threads)
+            try:
+                values = pool.map(func, entries)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            values = list(map(func, entries))
+
+        i = 0
+        for root in pending:
+            item = directories[root]
+            j = i + len(item['files'])
+            item['files'] = values[i:j]
+            i = j
+        return directories, changed
+
+    @staticmethod
+    def _walk_datum(entry, xattrs=True):
+        '''Semi-private method for collecting the stat and xattr data of a file
+
+        Args:
+            entry (DirEntry): File.
+            xattrs (bool, optional): Collect xattrs. Default: True.
+
+        Returns:
+            dict
+        '''
+        mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime = entry.stat()
+        stat_ = dict(
+            # mode=mode,
+            # ino=ino,
+            # dev=dev,
+            # nlink=nlink,
+            uid=uid,
+            gid=gid,
+            size=size,
+            last_access=atime,
+            modified=mtime,
+            creation=ctime
+        )
+        datum = {}
+        datum['filename'] = entry.name
+        datum['fullpath'] = entry.path
+        if xattrs:
+            datum['xattr'] = get_xattr(entry.path)
+        datum['stat'] = stat_
+        return datum
+
+    @staticmethod
+    def _walk_frame(index, values, xattrs=True):
+        '''Semi-private method for building a from_walk DataFrame
+
+        Args:
+            index (list): Path components of the directory of each file.
+            values (list): Data of each file.
+            xattrs (bool, optional): Include xattr column. Default: True.
+
+        Returns:
+            DataFrame
+        '''
+        vcols = ['filename', 'fullpath', 'xattr', 'stat']
+        if not xattrs:
+            vcols.remove('xattr')
+
+        max_ = max([0] + [len(x) for x in index])
+        index = [i + ['-->'] * (max_ - len(i)) for i in index]
+        kcols = ['k' + str(i).zfill(3) for i in range(max_)]
+
+        data = DataFrame(index, columns=kcols)
+        for col in vcols:
+            data[col] = [x[col] for x in values]
+        return data
+
+    def _walk_chunks(self, source, chunk_size, skip_regex, threads, xattrs):
+        '''Semi-private generator of the directories and data of files, chunk by chunk
+
+        Yields:
+            tuple: list of the path components of each file's directory and
+                list of the data of each file
+        '''
+        pool = None
+        get_data = partial(self._walk_datum, xattrs=xattrs)
+        if threads > 1:
+            pool = ThreadPool(threads)
+            get_data = partial(pool.map, get_data)
+        else:
+            get_data = partial(map, get_data)
+
+        def _chunk(files):
+            index = [x[0] for x in files]
+            values = list(get_data([x[1] for x in files]))
+            return index, values
+
+        try:
+            files = []
+            for item in self._walk_files(source, skip_regex):
+                files.append(item)
+                if len(files) >= chunk_size:
+                    yield _chunk(files)
+                    files = []
+            if files:
+                yield _chunk(files)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def iter_walk(self, source, chunk_size=10000, skip_regex='\.DS_Store', threads=1, xattrs=True):
+        '''Generate DataFrames of the files beneath a directory, chunk by chunk
+
+        Args:
+            source (str): Directory to walk.
+            chunk_size (int, optional): Maximum number of files in each chunk. Default: 10000
+            skip_regex (str, optional): Regular expression of filenames to skip. Default: .DS_Store
+            threads (int, optional): Number of threads collecting stat and
+                xattr data. Default: 1
+            xattrs (bool, optional): Collect xattrs. Default: True
+
+        Yields:
+            DataFrame: one row per file, with directory key columns (k000,
+                k001, ...) padded to the deepest directory of the chunk
+
+        Example:
+            >>> for chunk in sf.iter_walk('/renders', threads=8, xattrs=False):
+            ...     print(chunk.stat.apply(lambda x: x['size']).sum())
+        '''
+        for index, values in self._walk_chunks(source, chunk_size, skip_regex, threads, xattrs):
+            yield self._walk_frame(index, values, xattrs=xattrs)
+
+    def from_walk(self, source, aggregate=False, skip_regex='\.DS_Store', threads=1, xattrs=True,
+                  since=None, snapshot=None):
+        '''Read the files beneath a directory into a DataFrame
+
+        Args:
+            source (str): Directory to walk.
+            aggregate (bool, optional): Aggregate filenames by directory. Default: False
+            skip_regex (str, optional): Regular expression of filenames to skip. Default: .DS_Store
+            threads (int, optional): Number of threads collecting stat and
+                xattr data. Default: 1
+            xattrs (bool, optional): Collect xattrs. Default: True
+            since (str, optional): Snapshot file of a previous walk.  Only
+                directories whose mtime has changed since are scanned, the
+                files of all others are read from the snapshot. Default: None
+            snapshot (str, optional): Snapshot file to write for later walks.
+                Default: None
+
+        Returns:
+            StitchFrame
+
+        Example:
+            >>> sf.from_walk('/renders', snapshot='/tmp/renders.db')
+            >>> # an hour later
+            >>> sf.from_walk('/renders', since='/tmp/renders.db', snapshot='/tmp/renders.db')
+
+        Note:
+            A directory's mtime changes when files are added to, removed from
+            or renamed within it, not when a file is modified in place, so the
+            stat and xattr data of such files are those of the snapshot.
+        '''
         index = []
         values = []
-        for root, dirs, files in os.walk(source):
-            for file in filter(lambda x: not re.search(skip_regex, x), files):
-                ind = list(filter(lambda x: x != '', re.split(os.sep, root)))
-                index.append(ind)
-
-                fullpath = os.path.join(root, file)
-
-                mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime = os.stat(fullpath)
-                stat_ = dict(
-                    # mode=mode,
-                    # ino=ino,
-                    # dev=dev,
-                    # nlink=nlink,
-                    uid=uid,
-                    gid=gid,
-                    size=size,
-                    last_access=atime,
-                    modified=mtime,
-                    creation=ctime
-                )
-                datum = {}
-                datum['filename'] = file
-                datum['fullpath'] = fullpath
-                datum['xattr'] = get_xattr(fullpath)
-                datum['stat'] = stat_
-                values.append(datum)
-
-        sizes = list(map(len, index))
-        max_ = max(sizes)
-        sizes = [max_ - s for s in sizes]
-        index = [i + ['-->']*s for i, s in zip(index, sizes)]
-        kcols = ['k' + str(i).zfill(3) for i in range(max_)]
-        keys = DataFrame(index)
-        vals = DataFrame(values)
-        vcols = vals.columns.tolist()
-        data = pd.concat([keys, vals], axis=1, ignore_index=True)
-        data.columns = kcols + vcols
-        cols = kcols + ['filename', 'fullpath', 'xattr', 'stat']
-        data = data[cols]
+        if since is None and snapshot is None:
+            for index_, values_ in self._walk_chunks(source, 10000, skip_regex, threads, xattrs):
+                index.extend(index_)
+                values.extend(values_)
+        else:
+            metadata = dict(source=source, skip_regex=skip_regex, xattrs=xattrs)
+            known = {}
+            if since is not None:
+                metadata_, known = read_walk_snapshot(since)
+                # snapshots of other walks are of no use
+                if metadata_ != dict([(k, str(v)) for k, v in metadata.items()]):
+                    known = {}
+
+            directories, changed = self._walk_incremental(source, skip_regex, threads, xattrs, known)
+            for root, item in directories.items():
+                index.extend([self._walk_index(root)] * len(item['files']))
+                values.extend(item['files'])
+
+            if snapshot is not None:
+                if known and os.path.abspath(snapshot) == os.path.abspath(since):
+                    removed = set(known.keys()).difference(directories.keys())
+                    changed = OrderedDict([(x, directories[x]) for x in changed])
+                    write_walk_snapshot(snapshot, changed, metadata, remove=removed)
+                else:
+                    if os.path.exists(snapshot):
+                        os.remove(snapshot)
+                    write_walk_snapshot(snapshot, directories, metadata)
+
+        data = self._walk_frame(index, values, xattrs=xattrs)
+        kcols = [x for x in data.columns if x not in ['filename', 'fullpath', 'xattr', 'stat']]
 
         if aggregate:
             x = DataFrame()
@@ -1056,31 +1810,39 @@ class StitchFrame(Base):
         self._data = data
         return self
 
-    def from_nested_dict(self, item, justify='left'):
+    def from_nested_dict(self, item, justify='left', hierarchical=False):
         '''Reads nested dictionary into a DataFrame
 
+        Each leaf becomes a row of its keys, in columns k000 to kNNN padded
+        with '-->', followed by its value, in column v000.
+
         Args:
             item (dict): Dictionary to be read
-            name (str): Name of dictionary
+            justify (str, optional): Side to pad keys on, left or right. Default: left.
+            hierarchical (bool, optional): Put the keys in a MultiIndex, as
+                to_hierarchical does. Default: False.
 
         Returns:
             DataFrame
         '''
-        values = list(flatten_nested_dict(item).values())
-        data = None
-
-        index = nested_dict_to_matrix(item, justify=justify)
-        columns = []
-        for i, item in enumerate(index[0]):
-            columns.append('k' + str(i).zfill(3))
-        data = DataFrame(index, columns=columns)
-
-        data['v000'] = values
-        mask = data.apply(lambda x: x != 'null')
-        mask = mask[mask].dropna()
-        data = data.ix[mask.index]
-        if index:
-            data.reset_index(drop=True)
+        keys = []
+        values = []
+        # branches are skipped, leaving only the leaves
+        for key, value, branch in iter_nested_dict(item):
+            if not branch:
+                keys.append(key)
+                values.append(value)
+
+        index = pad_keys(keys, justify=justify)
+        width = len(index[0]) if index else 0
+        columns = ['k' + str(i).zfill(3) for i in range(width)]
+
+        if hierarchical and width > 0:
+            index = pd.MultiIndex.from_tuples([tuple(x) for x in index], names=columns)
+            data = DataFrame({'v000': values}, index=index, columns=['v000'])
+        else:
+            data = DataFrame(index, columns=columns)
+            data['v000'] = values
 
         self._data = data
         return self
@@ -1113,11 +1875,20 @@ class StitchFrame(Base):
         self._data = data
         return self
 
-    def to_nested_dict(self):
-        matrix = []
-        for row in self._data.values.tolist():
-            matrix.append(list(filter(lambda x: x != '-->', row)))
-        return matrix_to_nested_dict(matrix)
+    def to_nested_dict(self, index=False):
+        '''Converts rows of keys followed by a value into a nested dictionary
+
+        Args:
+            index (bool, optional): Lead each row with its index, as in frames
+                made by to_hierarchical. Default: False.
+
+        Returns:
+            dict
+        '''
+        rows = self._data.itertuples(index=index, name=None)
+        if index and isinstance(self._data.index, pd.MultiIndex):
+            rows = (row[0] + row[1:] for row in rows)
+        return matrix_to_nested_dict(rows)
 
     def to_inverted_dict(self, columns, key, prototype=True):
         '''Converts a list of columns containing dict or dict matrices to an inverted index
@@ -1159,12 +1930,113 @@ class StitchFrame(Base):
     # --------------------------------------------------------------------------
 
     # search
-    def search(self, string, field_operator='=='):
+    @property
+    def indexes(self):
+        return list(self._index_specs)
+
+    def create_index(self, column, kind='hash'):
+        '''Index a column so that searches on it need not scan every row
+
+        Indexes are used automatically by searches on their column and are
+        rebuilt the first time they are needed after the data is replaced or
+        a column is set through the StitchFrame.  Columns edited in place,
+        through to_dataframe for instance, must be passed to invalidate_index.
+
+        Args:
+            column (column name): Column to be indexed
+            kind (str, optional): Kind of index. Default: 'hash'
+                hash: equality (is, is not) queries
+                sorted: equality and range (<, <=, >, >=) queries on numeric
+                    or string columns
+                ngram: contains (~, ~~) queries whose values begin with at
+                    least three literal characters
+
+        Returns:
+            StitchFrame
+
+        Example:
+            >>> sf.create_index('status')
+            >>> sf.create_index('priority', kind='sorted')
+            >>> sf.create_index('name', kind='ngram')
+            >>> sf.search('(status) is (failed) & (priority) < (2501)')
+        '''
+        if kind not in INDEXES:
+            raise BadArgument('Unrecognized index kind: ' + str(kind))
+        if column not in self._data.columns:
+            raise NotFound('Column not found: ' + str(column))
+
+        key = (column, kind)
+        self._indexes[key] = create_index(self._data[column], kind=kind)
+        if key not in self._index_specs:
+            self._index_specs.append(key)
+        return self
+
+    def drop_index(self, column, kind=None):
+        '''Remove indexes from a column
+
+        Args:
+            column (column name): Indexed column
+            kind (str, optional): Kind of index to drop. Default: None (all kinds)
+
+        Returns:
+            StitchFrame
+        '''
+        for key in list(self._index_specs):
+            if key[0] == column and kind in [None, key[1]]:
+                self._index_specs.remove(key)
+                self._indexes.pop(key, None)
+        return self
+
+    def invalidate_index(self, column=None):
+        '''Mark the indexes of a column out of date, so that they are rebuilt when next needed
+
+        Args:
+            column (column name, optional): Indexed column. Default: None (all columns)
+
+        Returns:
+            StitchFrame
+        '''
+        for key in list(self._indexes.keys()):
+            if column is None or key[0] == column:
+                self._indexes.pop(key)
+        return self
+
+    def _get_indexes(self, columns=None):
+        '''Semi-private method for gathering built indexes by column
+
+        Args:
+            columns (list, optional): Columns to gather indexes of. Default: None (all)
+
+        Returns:
+            dict of lists of indexes by column name
+        '''
+        output = {}
+        for key in self._index_specs:
+            column, kind = key
+            if column not in self._data.columns:
+                continue
+            if columns is not None and column not in columns:
+                continue
+            if key not in self._indexes:
+                try:
+                    self._indexes[key] = create_index(self._data[column], kind=kind)
+                except (TypeError, BadArgument):
+                    # the column can no longer be indexed, scan it instead
+                    continue
+            output.setdefault(column, []).append(self._indexes[key])
+        return output
+
+    def search(self, string, field_operator='==', engine='vectorized', inplace=True):
         '''Query data using the Stitch Query Language (stitchql)
 
         Args:
             string (str): stitchql search string
             field_operator (str): Advanced feature, do not use.  Default: '=='
+            engine (str, optional): Query execution engine. Default: 'vectorized'
+                vectorized: evaluate queries as columnar array operations
+                python: evaluate queries one cell at a time
+            inplace (bool, optional): Replace data with the results, otherwise
+                return the results as a new StitchFrame. Default: True
 
         Returns:
             Queried (likely reduced) DataFrame
@@ -1246,11 +2118,49 @@ class StitchFrame(Base):
             single result.  Both operands are executed as independent queries and
             their results are then merged together with duplicate rows removed.
         '''
-        self._interpreter.search(string)
-        data = self._interpreter.dataframe_query(self._data, field_operator=field_operator)
+        self._last_search = self._interpreter.search(string)
+        data = self._interpreter.dataframe_query(self._data, field_operator=field_operator, engine=engine,
+                                                 query=self._last_search, indexes=self._get_indexes)
+
+        if not inplace:
+            return StitchFrame(data)
 
         self._data = data
         return self
+
+    def explain(self, string, field_operator='==', engine='vectorized'):
+        '''Profile a stitchql query without altering data
+
+        Args:
+            string (str): stitchql search string
+            field_operator (str): Advanced feature, do not use.  Default: '=='
+            engine (str, optional): Query execution engine. Default: 'vectorized'
+
+        Returns:
+            OrderedDict: parse and execute times, rows in and out and, for
+                each predicate, the execution path (indexed, vectorized or
+                python) of each column scanned, rows in and out and time
+
+        Example:
+            >>> report = sf.explain('(name) ~ (jack) & (age) > (30)')
+            >>> print(format_explain(report))
+            QUERY: (name) ~ (jack) & (age) > (30)
+              PARSE: 0.062 ms
+              EXECUTE: 0.714 ms
+              ROWS: 3 -> 1
+              PREDICATE: 0 (branch 0)
+                   query : ['name'] re.IGNORECASE ['jack']
+                 columns : name: vectorized
+                    rows : 3 -> 1
+                    time : 0.503 ms
+              PREDICATE: 1 (branch 0)
+                   query : ['age'] > [30.0]
+                 columns : age: vectorized
+                    rows : 1 -> 1
+                    time : 0.187 ms
+        '''
+        return self._interpreter.explain(string, self._data, field_operator=field_operator, engine=engine,
+                                         indexes=self._get_indexes)
 # ------------------------------------------------------------------------------
 
 def main():
@@ -0,0 +1,311 @@
+from __future__ import with_statement, print_function, absolute_import
+from itertools import *
+from functools import *
+import re
+import math
+from numbers import Number
+import numpy
+import pandas
+from stitch.core.utils import *
+from stitch.core.errors import BadArgument
+# ------------------------------------------------------------------------------
+
+'''
+.. module:: stitch_index
+	:platform: Unix
+	:synopsis: Column indexes used to accelerate stitchql queries
+
+.. moduleauthor:: Alex Braun <alexander.g.braun@gmail.com>
+'''
+
+class StitchIndex(Base):
+	'''
+	Base class for column indexes
+
+	Indexes map stitchql predicates on a single column to the positions of
+	the rows which satisfy them, so that queries need not scan the column.
+
+	Attributes:
+		kind (str): Kind of index.
+		operators (list): stitchql operators the index can answer.
+		size (int): Number of rows indexed.
+	'''
+	kind = None
+	operators = []
+
+	def __init__(self, series):
+		'''
+		StitchIndex initializer
+
+		Args:
+			series (Series): Column to be indexed.
+		'''
+		self._size = len(series)
+
+	@property
+	def size(self):
+		return self._size
+
+	def _complement(self, positions):
+		'''Semi-private method for returning all the positions not supplied'''
+		mask = numpy.ones(self._size, dtype=bool)
+		mask[positions] = False
+		return numpy.flatnonzero(mask)
+
+	def lookup(self, operator, values):
+		'''
+		Find the rows matching a stitchql predicate
+
+		Args:
+			operator (str): stitchql operator.
+			values (list): Values to look for.
+
+		Returns:
+			numpy.ndarray of row positions or None if the index cannot answer
+			the predicate
+		'''
+		if operator not in self.operators:
+			return None
+
+		output = []
+		for value in as_iterable(values):
+			positions = self._lookup(operator, value)
+			if positions is None:
+				return None
+			output.append(positions)
+
+		# a row matches if it matches any value
+		output = numpy.unique(numpy.concatenate(output))
+		return output
+
+	def _lookup(self, operator, value):
+		raise NotImplementedError('Please define this method in your subclass')
+
+class HashIndex(StitchIndex):
+	'''
+	Index mapping each distinct item of a column to the rows it occupies
+
+	Answers equality (==) and inequality (!=) predicates.
+	'''
+	kind = 'hash'
+	operators = ['==', '!=']
+
+	def __init__(self, series):
+		super(HashIndex, self).__init__(series)
+		# equal items such as 1, 1.0 and True share a single code
+		codes, uniques = pandas.factorize(series.values)
+		order = numpy.argsort(codes, kind='mergesort')
+		bounds = numpy.searchsorted(codes[order], numpy.arange(len(uniques) + 1))
+
+		self._lut = {}
+		for i, item in enumerate(uniques):
+			self._lut[item] = order[bounds[i]:bounds[i + 1]]
+
+	def _lookup(self, operator, value):
+		try:
+			positions = self._lut.get(value)
+		except TypeError:
+			return None
+
+		if positions is None:
+			positions = numpy.array([], dtype=int)
+		if operator == '!=':
+			return self._complement(positions)
+		return positions
+
+class SortedIndex(StitchIndex):
+	'''
+	Index of the rows of a column in sorted order
+
+	Answers equality, inequality and range (<, <=, >, >=) predicates on
+	numeric or string columns.
+	'''
+	kind = 'sorted'
+	operators = ['==', '!=', '<', '<=', '>', '>=']
+
+	def __init__(self, series):
+		super(SortedIndex, self).__init__(series)
+		dtype = pandas.api.types.infer_dtype(series.values)
+		if dtype in ['integer', 'floating', 'mixed-integer-float', 'boolean']:
+			self._type = Number
+		elif dtype == 'string':
+			self._type = str
+		else:
+			raise BadArgument('Sorted indexes require numeric or string columns, not ' + dtype)
+
+		positions = numpy.flatnonzero(series.notnull().values)
+		values = series.values[positions]
+		order = numpy.argsort(values, kind='mergesort')
+		self._positions = positions[order]
+		self._values = values[order]
+
+	def _lookup(self, operator, value):
+		# values of other types are left to a full scan
+		if not isinstance(value, self._type):
+			if operator in ['==', '!=']:
+				value = None
+			else:
+				return None
+
+		if value is None:
+			positions = numpy.array([], dtype=int)
+		else:
+			lower = upper = value
+			# stitchql numbers are floats, which would convert every integer
+			# searched into a float, so the bounds are made integers instead
+			if self._values.dtype.kind in 'iu' and isinstance(value, float) and numpy.isfinite(value):
+				lower = int(math.ceil(value))
+				upper = int(math.floor(value))
+			left = numpy.searchsorted(self._values, lower, side='left')
+			right = numpy.searchsorted(self._values, upper, side='right')
+			if operator in ['==', '!=']:
+				positions = self._positions[left:right]
+			elif operator == '<':
+				return self._positions[:left]
+			elif operator == '<=':
+				return self._positions[:right]
+			elif operator == '>':
+				return self._positions[right:]
+			elif operator == '>=':
+				return self._positions[left:]
+
+		if operator == '!=':
+			return self._complement(positions)
+		return positions
+
+class NgramIndex(StitchIndex):
+	'''
+	Inverted index of the n-grams found in the string form of each item
+
+	Answers contains (~) and case sensitive contains (~~) predicates whose
+	values begin with at least n literal characters.  The n-grams of that
+	literal narrow the search to a few candidate rows, which are then
+	confirmed with the full regular expression.
+	'''
+	kind = 'ngram'
+	operators = ['re', 're.IGNORECASE']
+	n = 3
+
+	def __init__(self, series):
+		super(NgramIndex, self).__init__(series)
+		self._strings = [str(x) for x in series.values]
+
+		postings = {}
+		for i, item in enumerate(self._strings):
+			item = item.lower()
+			for gram in set([item[j:j + self.n] for j in range(len(item) - self.n + 1)]):
+				postings.setdefault(gram, []).append(i)
+
+		self._postings = {}
+		for gram, positions in postings.items():
+			self._postings[gram] = numpy.array(positions, dtype=int)
+
+	def _lookup(self, operator, value):
+		value = str(value)
+		literal = get_literal_prefix(value).lower()
+		if len(literal) < self.n:
+			return None
+
+		candidates = None
+		for j in range(len(literal) - self.n + 1):
+			positions = self._postings.get(literal[j:j + self.n])
+			if positions is None:
+				return numpy.array([], dtype=int)
+			if candidates is None:
+				candidates = positions
+			else:
+				candidates = numpy.intersect1d(candidates, positions, assume_unique=True)
+
+		flags = 0
+		if operator == 're.IGNORECASE':
+			flags = re.IGNORECASE
+		regex = compile_regex(value, flags)
+		found = [p for p in candidates if regex.search(self._strings[p])]
+		return numpy.array(found, dtype=int)
+# ------------------------------------------------------------------------------
+
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+_REGEX_QUANTIFIERS = set('*?{')
+
+def get_literal_prefix(pattern):
+	'''
+	Get the literal text every match of a regular expression must begin with
+
+	Example:
+		>>> get_literal_prefix('^render_v\\d+')
+		'render_v'
+
+		>>> get_literal_prefix('errors?')
+		'error'
+
+		>>> get_literal_prefix('warn|error')
+		''
+
+	Args:
+		pattern (str): Regular expression.
+
+	Returns:
+		str
+	'''
+	# alternatives have no common literal
+	if '|' in pattern:
+		return ''
+
+	output = []
+	i = 0
+	if pattern.startswith('^'):
+		i = 1
+	while i < len(pattern):
+		char = pattern[i]
+		if char == '\\':
+			if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+				break
+			char = pattern[i + 1]
+			i += 2
+		elif char in _REGEX_SPECIAL:
+			break
+		else:
+			i += 1
+
+		# a quantified character is optional
+		if i < len(pattern) and pattern[i] in _REGEX_QUANTIFIERS:
+			break
+		output.append(char)
+	return ''.join(output)
+# ------------------------------------------------------------------------------
+
+INDEXES = {
+	'hash': HashIndex,
+	'sorted': SortedIndex,
+	'ngram': NgramIndex
+}
+
+def create_index(series, kind='hash'):
+	'''
+	Create an index of a given kind on a column
+
+	Args:
+		series (Series): Column to be indexed.
+		kind (str, optional): Kind of index (hash, sorted or ngram). Default: hash.
+
+	Returns:
+		StitchIndex
+	'''
+	if kind not in INDEXES:
+		raise BadArgument('Unrecognized index kind: ' + str(kind))
+	return INDEXES[kind](series)
+# ------------------------------------------------------------------------------
+
+def main():
+	'''
+	Run help if called directly
+	'''
+
+	import __main__
+	help(__main__)
+
+__all__ = ['StitchIndex', 'HashIndex', 'SortedIndex', 'NgramIndex', 'get_literal_prefix',
+		   'create_index']
+
+if __name__ == '__main__':
+	main()
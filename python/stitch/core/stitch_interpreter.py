@@ -1,10 +1,17 @@
 from __future__ import with_statement, print_function, absolute_import
 from itertools import *
 from functools import *
+import re
+import operator as op_
+import time
+from collections import OrderedDict
+from threading import Lock
 import numpy
 import pandas
+from pandas.api.types import infer_dtype
 from stitch.core.stitch_parser import StitchParser
 from stitch.core.utils import *
+from stitch.core.errors import BadArgument
 # ------------------------------------------------------------------------------
 
 '''
@@ -15,6 +22,20 @@ from stitch.core.utils import *
 .. moduleauthor:: Alex Braun <alexander.g.braun@gmail.com>
 '''
 
+_COMPARISON_OPS = {
+	'==': op_.eq,
+	'!=': op_.ne,
+	'<':  op_.lt,
+	'<=': op_.le,
+	'>':  op_.gt,
+	'>=': op_.ge
+}
+
+_REGEX_OPS = ['re', 're.IGNORECASE', 'nre', 'nre.IGNORECASE']
+
+# inferred column types whose items compare identically as arrays and as scalars
+_VECTORIZABLE = ['string', 'integer', 'floating', 'boolean']
+
 class StitchInterpreter(StitchParser):
 	'''
 	Subclass of StitchParser used for performing stitchql queries on supplied DataFrames
@@ -22,57 +43,395 @@ class StitchInterpreter(StitchParser):
 	Attributes:
 		last_search (str): Last stitchql query generated. Default: None.
 		search_stats(str): Print statistics about the last query made.
+		cache_stats(dict): Hits, misses and evictions of the query cache.
 	'''
-	def __init__(self):
-		super(StitchInterpreter, self).__init__()
+	def __init__(self, cache_size=128, parser='descent'):
+		super(StitchInterpreter, self).__init__(cache_size=cache_size, parser=parser)
+		self._column_cache = OrderedDict()
+		self._column_cache_lock = Lock()
+
+	def clear_cache(self):
+		'''
+		Remove all parsed queries and resolved columns from the caches
+
+		Returns:
+			None
+		'''
+		super(StitchInterpreter, self).clear_cache()
+		with self._column_cache_lock:
+			self._column_cache.clear()
 	# --------------------------------------------------------------------------
 
-	def _gen_dataframe_query(self, dataframe, fields=['all'], operator='==', values=[''], field_operator='=='):
+	def _get_columns(self, dataframe, fields=['all'], field_operator='=='):
+		'''
+		Semi-private method for resolving the columns a query applies to.
+
+		Args:
+			dataframe (DataFrame): DataFrame to query.
+			fields (list, optional): Fields to query. Default: ['all'].
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+
+		Returns:
+			list of column names
+		'''
+		if fields == ['all']:
+			return dataframe.columns.tolist()
+
+		# wide frames make resolving fields against every column expensive,
+		# so resolutions are cached by fields, operator and column names
+		key = (tuple(fields), field_operator, tuple(dataframe.columns))
+		with self._column_cache_lock:
+			columns = self._column_cache.pop(key, None)
+			if columns is not None:
+				self._column_cache[key] = columns
+				return list(columns)
+
+		columns = dataframe.columns.to_series()
+		mask = columns.apply(lambda x: bool_test(x, field_operator, fields))
+		columns = columns[mask].tolist()
+
+		if self._cache_size > 0:
+			with self._column_cache_lock:
+				self._column_cache[key] = columns
+				while len(self._column_cache) > self._cache_size:
+					self._column_cache.popitem(last=False)
+		return list(columns)
+
+	def _get_query_columns(self, dataframe, query, field_operator='=='):
+		'''
+		Semi-private method for resolving every column a stitchql query tests.
+
+		Args:
+			dataframe (DataFrame): DataFrame to query.
+			query (list): stitchql query.
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+
+		Returns:
+			list of column names
+		'''
+		output = []
+		for queries in query:
+			for q in queries:
+				for column in self._get_columns(dataframe, q['fields'], field_operator):
+					if column not in output:
+						output.append(column)
+		return output
+
+	def _python_mask(self, series, operator, values):
+		'''
+		Semi-private method for evaluating a query one cell at a time.
+
+		Args:
+			series (Series): Column to test.
+			operator (str): stitchql operator to use in the query.
+			values (list): Values to look for.
+
+		Returns:
+			numpy.ndarray of bools
+		'''
+		mask = series.apply(lambda x: bool_test(x, operator, values))
+		return mask.values.astype(bool)
+
+	def _vectorized_mask(self, series, operator, values):
+		'''
+		Semi-private method for evaluating a query as columnar array operations.
+
+		Args:
+			series (Series): Column to test.
+			operator (str): stitchql operator to use in the query.
+			values (list): Values to look for.
+
+		Returns:
+			numpy.ndarray of bools or None if the column must be evaluated
+			cell by cell
+		'''
+		values = as_iterable(values)
+		dtype = infer_dtype(series.values)
+		if dtype not in _VECTORIZABLE:
+			return None
+
+		if operator in _REGEX_OPS:
+			# bool_test searches the string representation of every item
+			if dtype != 'string' or series.isnull().any():
+				series = series.astype(str)
+
+			flags = 0
+			if operator in ['re.IGNORECASE', 'nre.IGNORECASE']:
+				flags = re.IGNORECASE
+
+			if operator in ['re', 're.IGNORECASE']:
+				# a single alternation finds any of the values in one pass, unless
+				# renumbering their groups would break numbered references
+				patterns = [str(x) for x in values]
+				numbered = any([NUMBERED_REFERENCE.search(x) for x in patterns])
+				if len(patterns) > 1 and not numbered:
+					pattern = '|'.join(['(?:' + x + ')' for x in patterns])
+					try:
+						compile_regex(pattern, flags)
+						patterns = [pattern]
+					except re.error:
+						pass
+
+				mask = numpy.zeros(len(series), dtype=bool)
+				for pattern in patterns:
+					regex = compile_regex(pattern, flags)
+					mask |= series.str.contains(regex).values.astype(bool)
+				return mask
+
+			# negated searches succeed if any single value is not found
+			mask = numpy.zeros(len(series), dtype=bool)
+			for value in values:
+				regex = compile_regex(str(value), flags)
+				mask |= ~series.str.contains(regex).values.astype(bool)
+			return mask
+
+		op = _COMPARISON_OPS[operator]
+		mask = numpy.zeros(len(series), dtype=bool)
+		for value in values:
+			mask |= numpy.asarray(op(series, value), dtype=bool)
+		return mask
+
+	def _index_mask(self, indexes, operator, values, rows):
+		'''
+		Semi-private method for evaluating a query using column indexes.
+
+		Args:
+			indexes (list): Indexes of the column to test.
+			operator (str): stitchql operator to use in the query.
+			values (list): Values to look for.
+			rows (numpy.ndarray): Positions of the rows to test.
+
+		Returns:
+			numpy.ndarray of bools or None if no index can answer the query
+		'''
+		for index in indexes:
+			positions = index.lookup(operator, values)
+			if positions is not None:
+				mask = numpy.zeros(index.size, dtype=bool)
+				mask[positions] = True
+				if len(rows) == index.size:
+					return mask
+				return mask[rows]
+		return None
+
+	def _gen_dataframe_query(self, dataframe, rows, fields=['all'], operator='==', values=[''], field_operator='==',
+							 engine='vectorized', indexes={}, paths=None):
 		'''
 		Semi-private method for processing invidual stitchql queries.
 
 		Args:
 			dataframe (DataFrame): DataFrame to query.
+			rows (numpy.ndarray): Positions of the rows to test.
 			fields (list, optional): Fields to query. Default: ['all'].
 			operator (str, optional): stitchql operator to use in the query. Default '=='.
 			values (list, optional): Values to look for. Default [''].
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+			engine (str, optional): Execution engine, vectorized or python. Default: vectorized.
+			indexes (dict, optional): Lists of column indexes by column name. Default: {}.
+			paths (OrderedDict, optional): Filled with the execution path
+				(indexed, vectorized or python) used for each column. Default: None.
 
 		Returns:
-			Results DataFrame
+			numpy.ndarray of bools, one for each row tested
 		'''
-		columns = dataframe.columns.to_series()
-		if fields != ['all']:
-			mask = columns.apply(lambda x: bool_test(x, field_operator, fields))
-			columns = columns[mask]
-		columns = columns.tolist()
+		columns = self._get_columns(dataframe, fields, field_operator)
+
+		mask = numpy.zeros(len(rows), dtype=bool)
+		for column in columns:
+			if column in indexes:
+				col_mask = self._index_mask(indexes[column], operator, values, rows)
+				if col_mask is not None:
+					mask |= col_mask
+					if paths is not None:
+						paths[column] = 'indexed'
+					continue
+
+			series = dataframe[column]
+			if len(rows) < len(dataframe):
+				series = series.iloc[rows]
 
-		mask = dataframe[columns].applymap(lambda x: bool_test(x, operator, values))
-		# This method avoids including prexisting nan values in the mask
-		mask[mask == False] = numpy.nan
-		mask.dropna(how='all', subset=columns, inplace=True)
-		return mask.index
+			col_mask = None
+			path = 'vectorized'
+			if engine == 'vectorized':
+				col_mask = self._vectorized_mask(series, operator, values)
+			if col_mask is None:
+				col_mask = self._python_mask(series, operator, values)
+				path = 'python'
+			mask |= col_mask
+			if paths is not None:
+				paths[column] = path
+		return mask
 
-	def dataframe_query(self, dataframe, field_operator='=='):
+	def _query_mask(self, dataframe, query, field_operator='==', engine='vectorized', indexes={}, profile=None):
+		'''
+		Semi-private method for evaluating a stitchql query as a boolean mask.
+
+		AND chains only test the rows still matching, OR branches only test the
+		rows not yet found.
+
+		Args:
+			dataframe (DataFrame): DataFrame to query.
+			query (list): stitchql query.
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+			engine (str, optional): Execution engine, vectorized or python. Default: vectorized.
+			indexes (dict or function, optional): Lists of column indexes by
+				column name, or a function returning them given the columns
+				the query tests. Default: {}.
+			profile (list, optional): Filled with a report of every predicate
+				evaluated. Default: None.
+
+		Returns:
+			numpy.ndarray of bools, one for each row of the DataFrame
+		'''
+		if callable(indexes):
+			indexes = indexes(self._get_query_columns(dataframe, query, field_operator))
+
+		mask = numpy.zeros(len(dataframe), dtype=bool)
+		for i, queries in enumerate(query):
+			rows = numpy.flatnonzero(~mask)
+			for q in queries:
+				if len(rows) == 0:
+					break
+
+				if profile is None:
+					found = self._gen_dataframe_query(dataframe, rows, q['fields'], q['operator'], q['values'],
+													  field_operator=field_operator, engine=engine, indexes=indexes)
+					rows = rows[found]
+					continue
+
+				paths = OrderedDict()
+				start = time.time()
+				found = self._gen_dataframe_query(dataframe, rows, q['fields'], q['operator'], q['values'],
+												  field_operator=field_operator, engine=engine, indexes=indexes,
+												  paths=paths)
+				stop = time.time()
+
+				item = OrderedDict()
+				item['branch'] = i
+				item['fields'] = q['fields']
+				item['operator'] = q['operator']
+				item['values'] = q['values']
+				item['columns'] = list(paths.keys())
+				item['paths'] = paths
+				item['rows_in'] = len(rows)
+				rows = rows[found]
+				item['rows_out'] = len(rows)
+				item['time'] = stop - start
+				profile.append(item)
+			mask[rows] = True
+		return mask
+
+	def dataframe_query(self, dataframe, field_operator='==', engine='vectorized', query=None, indexes={}):
 		'''
 		Query supplied DataFrame using last search.
 
+		Every query is evaluated as a boolean mask over the rows of the
+		DataFrame and the results are taken from the DataFrame once at the end.
+
 		Args:
 			dataframe (DataFrame): DataFrame to query.
 			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+			engine (str, optional): Execution engine. Default: vectorized.
+				vectorized: evaluate queries as columnar array operations,
+					falling back to python for columns of mixed type
+				python: evaluate queries one cell at a time
+			query (list, optional): stitchql query to use instead of the last search. Default: None.
+			indexes (dict or function, optional): Lists of column indexes by
+				column name, used in place of scanning those columns, or a
+				function returning them given the columns the query tests.
+				Default: {}.
 
 		Returns:
 			Results DataFrame
 		'''
+		if engine not in ['vectorized', 'python']:
+			raise BadArgument('Unrecognized engine: ' + str(engine))
+
 		if dataframe.index.has_duplicates:
 			raise IndexError('DataFrame has non-unique values in its index')
 
-		mask = pandas.Index([])
-		for queries in self._last_search:
-			and_mask = dataframe.index
-			for q in queries:
-				and_mask = self._gen_dataframe_query(dataframe.ix[and_mask], q['fields'], q['operator'], q['values'], field_operator=field_operator)
-			mask = mask.union(and_mask)
-		return dataframe.ix[mask]
+		if query is None:
+			query = self._last_search
+
+		mask = self._query_mask(dataframe, query, field_operator=field_operator, engine=engine, indexes=indexes)
+		return dataframe.take(numpy.flatnonzero(mask))
+
+	def explain(self, string, dataframe, field_operator='==', engine='vectorized', indexes={}):
+		'''
+		Profile a stitchql query against supplied DataFrame
+
+		Args:
+			string (str): stitchql search string.
+			dataframe (DataFrame): DataFrame to query.
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+			engine (str, optional): Execution engine, vectorized or python. Default: vectorized.
+			indexes (dict or function, optional): Lists of column indexes by
+				column name, or a function returning them given the columns
+				the query tests. Default: {}.
+
+		Returns:
+			OrderedDict: query, parse and execute times in seconds, rows in and
+				out and a report for each predicate evaluated, giving its
+				columns, the execution path used for each column (indexed,
+				vectorized or python), rows in and out and time in seconds
+
+		Example:
+			>>> report = interpreter.explain('(name) ~ (jack) & (age) > (30)', data)
+			>>> print(format_explain(report))
+		'''
+		if engine not in ['vectorized', 'python']:
+			raise BadArgument('Unrecognized engine: ' + str(engine))
+
+		if dataframe.index.has_duplicates:
+			raise IndexError('DataFrame has non-unique values in its index')
+
+		start = time.time()
+		query = self.search(string)
+		parse_time = time.time() - start
+
+		profile = []
+		start = time.time()
+		mask = self._query_mask(dataframe, query, field_operator=field_operator, engine=engine, indexes=indexes,
+								profile=profile)
+		execute_time = time.time() - start
+
+		output = OrderedDict()
+		output['query'] = string
+		output['parse_time'] = parse_time
+		output['execute_time'] = execute_time
+		output['rows_in'] = len(dataframe)
+		output['rows_out'] = int(mask.sum())
+		output['predicates'] = profile
+		return output
+# ------------------------------------------------------------------------------
+
+def format_explain(report):
+	'''
+	Format a report generated by StitchInterpreter.explain for display
+
+	Args:
+		report (dict): StitchInterpreter.explain report.
+
+	Returns:
+		str
+	'''
+	def ms(seconds):
+		return '{:.3f} ms'.format(seconds * 1000)
+
+	output = [
+		'QUERY: ' + report['query'],
+		'  PARSE: ' + ms(report['parse_time']),
+		'  EXECUTE: ' + ms(report['execute_time']),
+		'  ROWS: {} -> {}'.format(report['rows_in'], report['rows_out'])
+	]
+	for i, item in enumerate(report['predicates']):
+		output.append('  PREDICATE: {} (branch {})'.format(i, item['branch']))
+		output.append('    {:>8} : {} {} {}'.format('query', item['fields'], item['operator'], item['values']))
+		paths = ['{}: {}'.format(k, v) for k, v in item['paths'].items()]
+		output.append('    {:>8} : {}'.format('columns', ', '.join(paths)))
+		output.append('    {:>8} : {} -> {}'.format('rows', item['rows_in'], item['rows_out']))
+		output.append('    {:>8} : {}'.format('time', ms(item['time'])))
+	return '\n'.join(output)
 # ------------------------------------------------------------------------------
 
 def main():
@@ -83,7 +442,7 @@ def main():
 	import __main__
 	help(__main__)
 
-__all__ = ['StitchInterpreter']
+__all__ = ['StitchInterpreter', 'format_explain']
 
 if __name__ == '__main__':
 	main()
@@ -1,10 +1,15 @@
 from __future__ import with_statement, print_function, absolute_import
 from itertools import *
 from functools import *
+from collections import OrderedDict
+from copy import deepcopy
+import string as string_
+from threading import Lock
 from pyparsing import printables, nums
 from pyparsing import Word, Keyword, Or, Group
 from pyparsing import delimitedList, oneOf, OneOrMore, Suppress
 from stitch.core.utils import Base
+from stitch.core.errors import BadArgument, ParseError
 # ------------------------------------------------------------------------------
 
 '''
@@ -15,6 +20,205 @@ from stitch.core.utils import Base
 .. moduleauthor:: Alex Braun <alexander.g.braun@gmail.com>
 '''
 
+_WHITESPACE   = ' \t\n\r'
+_IDENT_CHARS  = set(string_.ascii_letters + string_.digits + '_$')
+_WORD_CHARS   = set(printables).difference(',")')
+_REGEX_CHARS  = set(printables + ' ').difference(',")')
+_NUMBER_CHARS = set(string_.digits + '.')
+
+# operator spellings in the order they are tried, longest spellings first
+_OPERATORS = [
+	(['is not',                 'isnot',  '!='], '!='),
+	(['is',                                '='], '=='),
+	(['cscontains',            'cscont',  '~~'], 're'),
+	(['does not cscontain', 'csnotcont', '!~~'], 'nre'),
+	(['contains',                'cont',   '~'], 're.IGNORECASE'),
+	(['does not contain',     'notcont',  '!~'], 'nre.IGNORECASE'),
+	(['greater than equal to',    'gte',  '>='], '>='),
+	(['greater than',              'gt',   '>'], '>'),
+	(['less than equal to',       'lte',  '<='], '<='),
+	(['less than',                 'ls',   '<'], '<')
+]
+
+class DescentParser(Base):
+	'''
+	Hand-written recursive descent parser for stitchql
+
+	Produces the same queries as the pyparsing grammar of StitchParser
+	without building a grammar or backtracking through alternatives.
+
+	Grammar:
+		line     : fragment ('|' fragment)*
+		fragment : compound compound*
+		compound : query ('&' query)*
+		query    : '(' items ')' operator '(' items ')'
+		items    : item item* (',' item item*)*
+		item     : number | word | '"' regex '"'
+	'''
+	def parse(self, string):
+		'''
+		Parse a stitchql string
+
+		Args:
+			string(str): stitchql formatted string to be parsed.
+
+		Returns:
+			stitchql query.
+		'''
+		self._string = string.expandtabs()
+		self._pos = 0
+		try:
+			return self._line()
+		except _Mismatch as e:
+			raise ParseError(str(e))
+	# --------------------------------------------------------------------------
+
+	def _skip(self):
+		while self._pos < len(self._string) and self._string[self._pos] in _WHITESPACE:
+			self._pos += 1
+
+	def _fail(self, expected):
+		raise _Mismatch('Expected ' + expected + ' (at char ' + str(self._pos) + ')')
+
+	def _optional(self, func):
+		'''Apply func, restoring the position and returning None if it fails'''
+		pos = self._pos
+		try:
+			return func()
+		except _Mismatch:
+			self._pos = pos
+			return None
+
+	def _literal(self, literal):
+		self._skip()
+		if not self._string.startswith(literal, self._pos):
+			self._fail('"' + literal + '"')
+		self._pos += len(literal)
+
+	def _keyword(self, keyword):
+		self._skip()
+		end = self._pos + len(keyword)
+		if not self._string.startswith(keyword, self._pos):
+			self._fail('"' + keyword + '"')
+		if end < len(self._string) and self._string[end] in _IDENT_CHARS:
+			self._fail('"' + keyword + '"')
+		if self._pos > 0 and self._string[self._pos - 1] in _IDENT_CHARS:
+			self._fail('"' + keyword + '"')
+		self._pos = end
+
+	def _run(self, chars):
+		'''Consume and return the longest run of chars at the current position'''
+		start = self._pos
+		end = start
+		while end < len(self._string) and self._string[end] in chars:
+			end += 1
+		return self._string[start:end]
+	# --------------------------------------------------------------------------
+
+	def _line(self):
+		output = self._fragment()
+		while True:
+			fragment = self._optional(self._or_fragment)
+			if fragment is None:
+				return output
+			output.extend(fragment)
+
+	def _or_fragment(self):
+		self._keyword('|')
+		return self._fragment()
+
+	def _fragment(self):
+		output = [self._compound()]
+		while True:
+			compound = self._optional(self._compound)
+			if compound is None:
+				return output
+			output.append(compound)
+
+	def _compound(self):
+		output = [self._query()]
+		while True:
+			query = self._optional(self._and_query)
+			if query is None:
+				return output
+			output.append(query)
+
+	def _and_query(self):
+		self._keyword('&')
+		return self._query()
+
+	def _query(self):
+		query = {}
+		query['fields'] = self._group()
+		query['operator'] = self._operator()
+		query['values'] = self._group()
+		return query
+
+	def _group(self):
+		self._literal('(')
+		output = self._items()
+		self._literal(')')
+		return output
+
+	def _items(self):
+		output = self._item_run()
+		while True:
+			items = self._optional(self._comma_item_run)
+			if items is None:
+				return output
+			output.extend(items)
+
+	def _comma_item_run(self):
+		self._literal(',')
+		return self._item_run()
+
+	def _item_run(self):
+		output = [self._item()]
+		while True:
+			item = self._optional(self._item)
+			if item is None:
+				return output
+			output.append(item)
+
+	def _item(self):
+		self._skip()
+		if self._string.startswith('"', self._pos):
+			self._pos += 1
+			self._skip()
+			regex = self._run(_REGEX_CHARS)
+			if not regex:
+				self._fail('regex')
+			self._pos += len(regex)
+			self._literal('"')
+			return regex
+
+		word = self._run(_WORD_CHARS)
+		if not word:
+			self._fail('word')
+		self._pos += len(word)
+
+		# numbers are words made entirely of digits and periods
+		if set(word).issubset(_NUMBER_CHARS):
+			try:
+				return float(word)
+			except ValueError:
+				pass
+		return word
+
+	def _operator(self):
+		self._skip()
+		lower = self._string[self._pos:].lower()
+		for spellings, operator in _OPERATORS:
+			for spelling in spellings:
+				if lower.startswith(spelling):
+					self._pos += len(spelling)
+					return operator
+		self._fail('operator')
+
+class _Mismatch(Exception):
+	pass
+# ------------------------------------------------------------------------------
+
 class StitchParser(Base):
 	'''
 	Class for generating queries for which to filter DataFrames
@@ -22,9 +226,80 @@ class StitchParser(Base):
 	Attributes:
 		last_search (str): Last stitchql query generated. Default: None.
 		search_stats(str): Print statistics about the last query made.
+		cache_stats(dict): Hits, misses and evictions of the query cache.
 	'''
 
-	def __init__(self):
+	def __init__(self, cache_size=128, parser='descent'):
+		'''
+		StitchParser initializer
+
+		Args:
+			cache_size (int, optional): Maximum number of parsed queries to cache. Default: 128.
+			parser (str, optional): Query parser to use. Default: descent.
+				descent: hand-written recursive descent parser
+				pyparsing: pyparsing grammar
+		'''
+		if parser not in ['descent', 'pyparsing']:
+			raise BadArgument('Unrecognized parser: ' + str(parser))
+
+		self._parser = parser
+		self._line = None
+		self._last_search = None
+
+		self._cache = OrderedDict()
+		self._cache_lock = Lock()
+		self._cache_size = cache_size
+		self._cache_hits = 0
+		self._cache_misses = 0
+		self._cache_evictions = 0
+
+	@property
+	def last_search(self):
+		return self._last_search
+
+	@property
+	def cache_stats(self):
+		return {
+			'hits': self._cache_hits,
+			'misses': self._cache_misses,
+			'evictions': self._cache_evictions,
+			'size': len(self._cache),
+			'max_size': self._cache_size
+		}
+
+	def clear_cache(self):
+		'''
+		Remove all parsed queries from the query cache and reset its statistics
+
+		Returns:
+			None
+		'''
+		with self._cache_lock:
+			self._cache.clear()
+			self._cache_hits = 0
+			self._cache_misses = 0
+			self._cache_evictions = 0
+
+	@property
+	def search_stats(self):
+		print('---------------------------------')
+		print('')
+		for i, cq in enumerate(self._last_search):
+			print('COMPOUND QUERY: ' + str(i))
+			for x, q in enumerate(cq):
+				print('  QUERY: ' + str(x))
+				for key, val in q.items():
+					print('    {:>8} : {}'.format(key, val))
+			print('---------------------------------')
+			print('')
+
+	def _build_grammar(self):
+		'''
+		Semi-private method for building the pyparsing grammar.
+
+		Returns:
+			pyparsing grammar.
+		'''
 		all_chars            = printables + ' '
 		regex                = Suppress('"') + Word(all_chars, excludeChars=',")') + Suppress('"')
 		word                 = Word(printables, excludeChars=',")')
@@ -52,30 +327,11 @@ class StitchParser(Base):
 		query                = Group(fields + operator + values)
 		compound_query       = Group(delimitedList(query, delim=and_))
 		fragment             = OneOrMore(compound_query)
-		self._line           = delimitedList(fragment, delim=or_)
-
-		self._last_search = None
-
-	@property
-	def last_search(self):
-		return self._last_search
+		return delimitedList(fragment, delim=or_)
 
-	@property
-	def search_stats(self):
-		print('---------------------------------')
-		print('')
-		for i, cq in enumerate(self._last_search):
-			print('COMPOUND QUERY: ' + str(i))
-			for x, q in enumerate(cq):
-				print('  QUERY: ' + str(x))
-				for key, val in q.items():
-					print('    {:>8} : {}'.format(key, val))
-			print('---------------------------------')
-			print('')
-
-	def search(self, string):
+	def _parse(self, string):
 		'''
-		Generate query from string and place it in last_search
+		Semi-private method for parsing a string into a stitchql query.
 
 		Args:
 			string(str): stitchql formatted string to be parsed.
@@ -83,6 +339,13 @@ class StitchParser(Base):
 		Returns:
 			stitchql query.
 		'''
+		if self._parser == 'descent':
+			return DescentParser().parse(string)
+
+		# the grammar is only built when it is asked for
+		if self._line is None:
+			self._line = self._build_grammar()
+
 		results = []
 		for fragment in self._line.parseString(string):
 			compound_query = []
@@ -90,13 +353,42 @@ class StitchParser(Base):
 				query = {}
 				for key, value in q.asDict().items():
 					query[key] = value
-					# if key == 'operator':
-					# 	query[key] = value
-					# else:
-					# 	query[key] = value.asList()
 				compound_query.append(query)
 			results.append(compound_query)
+		return results
+
+	def search(self, string):
+		'''
+		Generate query from string and place it in last_search
+
+		Parsed queries are kept in a least recently used cache, so repeated
+		searches do not reparse their strings.
+
+		Args:
+			string(str): stitchql formatted string to be parsed.
+
+		Returns:
+			stitchql query.
+		'''
+		with self._cache_lock:
+			results = self._cache.pop(string, None)
+			if results is not None:
+				self._cache_hits += 1
+				self._cache[string] = results
+			else:
+				self._cache_misses += 1
+
+		if results is None:
+			results = self._parse(string)
+			if self._cache_size > 0:
+				with self._cache_lock:
+					self._cache[string] = results
+					while len(self._cache) > self._cache_size:
+						self._cache.popitem(last=False)
+						self._cache_evictions += 1
 
+		# callers are free to modify the query they are handed
+		results = deepcopy(results)
 		self._last_search = results
 		return results
 # ------------------------------------------------------------------------------
@@ -109,7 +401,7 @@ def main():
 	import __main__
 	help(__main__)
 
-__all__ = ['StitchParser']
+__all__ = ['StitchParser', 'DescentParser']
 
 if __name__ == '__main__':
 	main()
@@ -3,12 +3,17 @@ from itertools import *
 from functools import *
 import warnings
 import re
+import os
+import json
+import base64
+import sqlite3
 from copy import copy, deepcopy
 from decimal import Decimal
 import numpy as np
 import pandas as pd
 from pandas import DataFrame, Series
 from collections import OrderedDict, namedtuple
+from threading import Lock
 from xattr import xattr
 # ------------------------------------------------------------------------------
 
@@ -110,6 +115,69 @@ def eval_(item):
 		return item
 # ------------------------------------------------------------------------------
 
+_REGEX_CACHE = OrderedDict()
+_REGEX_CACHE_SIZE = 1024
+_REGEX_CACHE_LOCK = Lock()
+_REGEX_CACHE_STATS = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+# backreferences (\1) and conditionals ((?(1)...)) which refer to groups by
+# number, and so break when a pattern is wrapped in or joined to other groups
+NUMBERED_REFERENCE = re.compile(r'\\[1-9]|\(\?\(\d')
+
+def compile_regex(pattern, flags=0):
+	'''Compile a regular expression, reusing a previously compiled pattern if possible
+
+	Compiled patterns are kept in a thread-safe least recently used cache
+	keyed by pattern and flags, which is shared by bool_test and the regex
+	utilities.
+
+	Args:
+		pattern (str): Regular expression pattern.
+		flags (int, optional): re flags. Default: 0.
+
+	Returns:
+		Compiled regular expression.
+	'''
+	key = (pattern, flags)
+	with _REGEX_CACHE_LOCK:
+		regex = _REGEX_CACHE.pop(key, None)
+		if regex is not None:
+			_REGEX_CACHE[key] = regex
+			_REGEX_CACHE_STATS['hits'] += 1
+			return regex
+		_REGEX_CACHE_STATS['misses'] += 1
+
+	regex = re.compile(pattern, flags)
+	with _REGEX_CACHE_LOCK:
+		_REGEX_CACHE[key] = regex
+		while len(_REGEX_CACHE) > _REGEX_CACHE_SIZE:
+			_REGEX_CACHE.popitem(last=False)
+			_REGEX_CACHE_STATS['evictions'] += 1
+	return regex
+
+def regex_cache_stats():
+	'''Returns the hits, misses, evictions and size of the compiled regex cache'''
+	with _REGEX_CACHE_LOCK:
+		output = dict(_REGEX_CACHE_STATS)
+		output['size'] = len(_REGEX_CACHE)
+		output['max_size'] = _REGEX_CACHE_SIZE
+	return output
+
+def clear_regex_cache(size=None):
+	'''Empties the compiled regex cache and resets its statistics
+
+	Args:
+		size (int, optional): New maximum number of cached patterns. Default: None.
+	'''
+	global _REGEX_CACHE_SIZE
+	with _REGEX_CACHE_LOCK:
+		_REGEX_CACHE.clear()
+		for key in _REGEX_CACHE_STATS.keys():
+			_REGEX_CACHE_STATS[key] = 0
+		if size is not None:
+			_REGEX_CACHE_SIZE = size
+# ------------------------------------------------------------------------------
+
 def _eq(item, value):
 	return item == value
 
@@ -129,28 +197,28 @@ def _gte(item, value):
 	return item >= value
 
 def _re(item, value):
-	found = re.search(str(value), str(item))
+	found = compile_regex(str(value)).search(str(item))
 	if found:
 		return True
 	else:
 		return False
 
 def _reig(item, value):
-	found = re.search(str(value), str(item), flags=re.IGNORECASE)
+	found = compile_regex(str(value), re.IGNORECASE).search(str(item))
 	if found:
 		return True
 	else:
 		return False
 
 def _nre(item, value):
-	found = re.search(str(value), str(item))
+	found = compile_regex(str(value)).search(str(item))
 	if not found:
 		return True
 	else:
 		return False
 
 def _nreig(item, value):
-	found = re.search(str(value), str(item), flags=re.IGNORECASE)
+	found = compile_regex(str(value), re.IGNORECASE).search(str(item))
 	if not found:
 		return True
 	else:
@@ -179,9 +247,9 @@ def bool_test(item, operator, values):
 
 def regex_match(pattern, string, group=0, ignore_case=False):
 	if ignore_case:
-		regex = re.compile(pattern, flags=re.IGNORECASE)
+		regex = compile_regex(pattern, re.IGNORECASE)
 	else:
-		regex = re.compile(pattern)
+		regex = compile_regex(pattern)
 	found = None
 	try:
 		found = regex.match(string)
@@ -194,9 +262,9 @@ def regex_match(pattern, string, group=0, ignore_case=False):
 
 def regex_search(pattern, string, group=0, ignore_case=False):
 	if ignore_case:
-		regex = re.compile(pattern, flags=re.IGNORECASE)
+		regex = compile_regex(pattern, re.IGNORECASE)
 	else:
-		regex = re.compile(pattern)
+		regex = compile_regex(pattern)
 	found = None
 	try:
 		found = regex.search(string)
@@ -209,21 +277,19 @@ def regex_search(pattern, string, group=0, ignore_case=False):
 
 def regex_sub(pattern, repl, string, count=0, ignore_case=False):
 	if ignore_case:
-		try:
-			return re.sub(pattern, repl, string, count=count, flags=re.IGNORECASE)
-		except TypeError:
-			return string
+		regex = compile_regex(pattern, re.IGNORECASE)
 	else:
-		try:
-			return re.sub(pattern, repl, string, count=count)
-		except TypeError:
-			return string
+		regex = compile_regex(pattern)
+	try:
+		return regex.sub(repl, string, count=count)
+	except TypeError:
+		return string
 
 def regex_split(pattern, string, ignore_case=False):
 	if ignore_case:
-		regex = re.compile(pattern, flags=re.IGNORECASE)
+		regex = compile_regex(pattern, re.IGNORECASE)
 	else:
-		regex = re.compile(pattern)
+		regex = compile_regex(pattern)
 	found = None
 	try:
 		found = regex.search(string)
@@ -303,19 +369,66 @@ def flatten_nested_dict(item, separator='_', null='null'):
 			a_b1_c : 1
 		}
 	'''
-	temp = OrderedDict()
-	def _flatten_nested_dict(item, name):
-		for key, val in item.items():
-			if type(val) is dict and val != {}:
-				temp[name + separator + str(key)] = null
-				_flatten_nested_dict(val, name + separator + str(key))
-			else:
-				temp[name + separator + str(key)] = val
-	_flatten_nested_dict(item, '__null__')
 	output = OrderedDict()
-	header = 8 + len(separator)
-	for key, value in temp.items():
-		output[key[header:]] = value
+	for keys, value, branch in iter_nested_dict(item):
+		if branch:
+			value = null
+		output[separator.join(map(str, keys))] = value
+	return output
+
+def iter_nested_dict(item):
+	'''Iterate over every node of a nested dictionary, depth first
+
+	Only non-empty dicts are descended into.
+
+	Example:
+		>>> list(iter_nested_dict({'a': {'b': 1}}))
+		[(('a',), {'b': 1}, True), (('a', 'b'), 1, False)]
+
+	Args:
+		item (dict): Nested dictionary.
+
+	Yields:
+		tuple: Tuple of the keys leading to the node, its value and whether
+			it is a branch.
+	'''
+	stack = [(tuple(), iter(item.items()))]
+	while stack:
+		parent, items = stack[-1]
+		for key, value in items:
+			keys = parent + (key,)
+			if type(value) is dict and value != {}:
+				yield keys, value, True
+				stack.append((keys, iter(value.items())))
+				break
+			yield keys, value, False
+		else:
+			stack.pop()
+
+def pad_keys(keys, justify='left'):
+	'''Convert tuples of keys into rows of strings of equal length, padded with '-->'
+
+	Example:
+		>>> pad_keys([('a',), ('a', 'b1', 'c')], justify='right')
+		[['-->', '-->', 'a'], ['a', 'b1', 'c']]
+
+	Args:
+		keys (list): Tuples of keys.
+		justify (str, optional): Side to pad keys on, left or right. Default: left.
+
+	Returns:
+		list of lists
+	'''
+	max_ = max([len(x) for x in keys] + [0])
+
+	output = []
+	for key in keys:
+		pad = ['-->'] * (max_ - len(key))
+		key = list(map(str, key))
+		if justify == 'right':
+			output.append(pad + key)
+		else:
+			output.append(key + pad)
 	return output
 
 def nested_dict_to_matrix(item, justify='left'):
@@ -336,59 +449,69 @@ def nested_dict_to_matrix(item, justify='left'):
 		['a', 'b1', 'c']
 		['a', 'b2', '-->']
 	'''
-	matrix = flatten_nested_dict(item, separator='__null__')
-	matrix = [x.split('__null__') for x in matrix.keys()]
-	max_ = 0
-	for item in matrix:
-		if len(item) > max_:
-			max_ = len(item)
-	for item in matrix:
-		while len(item) < max_:
-			if justify == 'right':
-				item.insert(0, '-->')
-			else:
-				item.append('-->')
-
-	return matrix
+	keys = [x[0] for x in iter_nested_dict(item)]
+	return pad_keys(keys, justify=justify)
 
 def nested_dict_to_index(item, justify='left'):
 	'''Convert a nested dictionary to a MultiIndex object'''
 	index = nested_dict_to_matrix(item, justify=justify)
-	index = DataFrame(index).transpose().values.tolist()
+	index = [list(x) for x in zip(*index)]
 	return index
 
 def matrix_to_nested_dict(matrix):
 	'''Converts a matrix to a nested dictionary
 
+	Each row is a list of keys followed by a value.  Rows may come in any
+	order, '-->' padding keys are ignored and a key which is both a branch
+	and a leaf is kept as a branch.
+
 	Example:
 		>>> item
 		[ ['a', 'b1', 'c', 1],
 		  ['a', 'b2', 0] ]
 
-		>>> nested_dict_to_matrix(item)
+		>>> matrix_to_nested_dict(item)
 		{'a': {
 			   'b1': {
 					  'c': 1},
 			   'b2': 0
 			}
 		}
-	'''
-	# ensures deepest branches appear first
-	matrix = list(reversed(sorted(matrix)))
 
+	Args:
+		matrix (iterable): Rows of keys and values.
+
+	Returns:
+		dict
+	'''
 	output = {}
+	# ids of the dicts created here, as opposed to dict values
+	branches = set()
+	# the branch found at the end of each tuple of keys
+	cursors = {(): output}
 	for row in matrix:
-		keys = row[0:-1]
-		value = row[-1]
-
-		cursor = output
-		for key in keys[0:-1]:
-			if key not in cursor:
-				cursor[key] = {}
-				cursor = cursor[key]
-			else:
-				cursor = cursor[key]
-		cursor[keys[-1]] = value
+		row = tuple(row)
+		keys = row[:-1]
+		if '-->' in keys:
+			keys = tuple([x for x in keys if x != '-->'])
+		if len(keys) == 0:
+			continue
+
+		parent = keys[:-1]
+		cursor = cursors.get(parent)
+		if cursor is None:
+			cursor = output
+			for key in parent:
+				child = cursor.get(key)
+				if id(child) not in branches:
+					child = {}
+					cursor[key] = child
+					branches.add(id(child))
+				cursor = child
+			cursors[parent] = cursor
+
+		if id(cursor.get(keys[-1])) not in branches:
+			cursor[keys[-1]] = row[-1]
 	return output
 
 def interpret_nested_dict(item, predicate):
@@ -603,12 +726,24 @@ def list_to_lut(items, interchange_lut):
 		lut[lut.keys()[i]] = item
 	return lut
 
+# substitutions made before and after lowercasing a string
+SNAKECASE_SPLITS = [
+	(re.compile('([^_])([A-Z][a-z]+)'), r'\1_\2'),
+	(re.compile('([a-z0-9])([A-Z])'), r'\1_\2')
+]
+SNAKECASE_JOINS = [
+	(re.compile(r'\.'), '_'),
+	(re.compile(' +'), '_'),
+	(re.compile('__+'), '_')
+]
+
 def as_snakecase(string):
-    output = re.sub('([^_])([A-Z][a-z]+)', r'\1_\2', string)
-    output = re.sub('([a-z0-9])([A-Z])', r'\1_\2', output).lower()
-    output = re.sub('\.', '_', output)
-    output = re.sub(' +', '_', output)
-    output = re.sub('__+', '_', output)
+    output = string
+    for regex, repl in SNAKECASE_SPLITS:
+        output = regex.sub(repl, output)
+    output = output.lower()
+    for regex, repl in SNAKECASE_JOINS:
+        output = regex.sub(repl, output)
     return output
 
 def nan_to_bottom(series):
@@ -620,10 +755,13 @@ def nan_to_bottom(series):
 	Returns:
 		Series with nan elements at the bottom.
 	'''
-	data = series.dropna()
-	buf = [np.nan] * (series.size - data.size)
-	data = data.append(Series(buf))
-	data = Series(list(data), index=series.index)
+	# a stable sort of the null mask keeps the order of the other elements
+	mask = series.isnull().values
+	order = np.argsort(mask, kind='mergesort')
+	data = series.values.take(order)
+	if data.dtype.kind == 'O':
+		data[mask[order]] = np.nan
+	data = Series(data, index=series.index, name=series.name)
 	return data
 
 def reduce_units(series, new_unit='-', min=0):
@@ -688,6 +826,80 @@ def remove_xattr(fullpath, xattrs):
         x.remove(k)
 # ------------------------------------------------------------------------------
 
+def _to_snapshot_json(item):
+	'''Semi-private function for storing bytes, such as xattr values, in JSON'''
+	if isinstance(item, bytes):
+		return {'__base64__': base64.b64encode(item).decode('ascii')}
+	raise TypeError(repr(item) + ' cannot be stored in a snapshot')
+
+def _from_snapshot_json(item):
+	'''Semi-private function for restoring bytes stored by _to_snapshot_json'''
+	if len(item) == 1 and '__base64__' in item:
+		return base64.b64decode(item['__base64__'])
+	return item
+
+def read_walk_snapshot(fullpath):
+	'''Reads a directory snapshot written by write_walk_snapshot
+
+	Args:
+		fullpath (str): Snapshot SQLite file.
+
+	Returns:
+		tuple: dict of metadata and dict of directories by path, each a dict
+			of mtime (nanoseconds), dirs (list of subdirectory paths) and
+			files (list of file data). Both are empty if the snapshot does not exist.
+	'''
+	if not os.path.exists(fullpath):
+		return {}, {}
+
+	conn = sqlite3.connect(fullpath)
+	try:
+		metadata = dict(conn.execute('SELECT key, value FROM metadata'))
+		directories = {}
+		for path, mtime, dirs, files in conn.execute('SELECT path, mtime, dirs, files FROM directories'):
+			directories[path] = dict(
+				mtime=mtime,
+				dirs=json.loads(dirs, object_hook=_from_snapshot_json),
+				files=json.loads(files, object_hook=_from_snapshot_json)
+			)
+	except (sqlite3.DatabaseError, ValueError, TypeError):
+		return {}, {}
+	finally:
+		conn.close()
+	return metadata, directories
+
+def write_walk_snapshot(fullpath, directories, metadata, remove=[]):
+	'''Writes directories to a snapshot, replacing those already in it
+
+	Args:
+		fullpath (str): Snapshot SQLite file.
+		directories (dict): Directories by path, each a dict of mtime, dirs and files.
+		metadata (dict): Metadata of the snapshot, such as its source.
+		remove (list, optional): Paths of directories to remove from the snapshot. Default: [].
+
+	Returns:
+		None
+	'''
+	rows = []
+	for path, item in directories.items():
+		dirs = json.dumps(item['dirs'], default=_to_snapshot_json)
+		files = json.dumps(item['files'], default=_to_snapshot_json)
+		rows.append((path, item['mtime'], dirs, files))
+
+	conn = sqlite3.connect(fullpath)
+	try:
+		with conn:
+			conn.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)')
+			conn.execute('CREATE TABLE IF NOT EXISTS directories '
+						 '(path TEXT PRIMARY KEY, mtime INTEGER, dirs TEXT, files TEXT)')
+			conn.executemany('INSERT OR REPLACE INTO metadata VALUES (?, ?)',
+							 [(k, str(v)) for k, v in metadata.items()])
+			conn.executemany('DELETE FROM directories WHERE path = ?', [(x,) for x in remove])
+			conn.executemany('INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)', rows)
+	finally:
+		conn.close()
+# ------------------------------------------------------------------------------
+
 def main():
 	'''Run help if called directly'''
 
@@ -707,6 +919,10 @@ __all__ = [
 	'round_to',
 	'try_',
 	'eval_',
+	'compile_regex',
+	'regex_cache_stats',
+	'clear_regex_cache',
+	'NUMBERED_REFERENCE',
 	'bool_test',
 	'regex_match',
 	'regex_search',
@@ -716,6 +932,8 @@ __all__ = [
 	'reduce_units',
 	'dict_to_namedtuple',
 	'flatten_nested_dict',
+	'iter_nested_dict',
+	'pad_keys',
 	'nested_dict_to_matrix',
 	'nested_dict_to_index',
 	'matrix_to_nested_dict',
@@ -728,12 +946,16 @@ __all__ = [
 	'index_to_matrix',
 	'double_lut_transform',
 	'list_to_lut',
+	'SNAKECASE_SPLITS',
+	'SNAKECASE_JOINS',
 	'as_snakecase',
 	'nan_to_bottom',
 	'reduce_units',
 	'get_xattr',
 	'set_xattr',
-	'remove_xattr'
+	'remove_xattr',
+	'read_walk_snapshot',
+	'write_walk_snapshot'
 ]
 
 if __name__ == '__main__':
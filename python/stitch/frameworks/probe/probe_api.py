@@ -3,9 +3,10 @@ from itertools import *
 from functools import *
 from collections import OrderedDict
 import json
+import pandas as pd
 from stitch.core.errors import *
 from stitch.core.utils import *
-from stitch.core.stitch_interpreter import StitchInterpreter
+from stitch.core.stitch_interpreter import StitchInterpreter, format_explain
 from stitch.core.stitch_frame import StitchFrame
 # ------------------------------------------------------------------------------
 
@@ -84,6 +85,23 @@ class ProbeAPI(Base):
 
 		results = results._data.to_json(orient='records')
 		self._results = results
+
+	def explain(self, string, field_operator='==', engine='vectorized'):
+		'''
+		Profile a stitchql query against the database without storing results
+
+		Args:
+			string (str): stitchql search string.
+			field_operator (str, optional): Operator used for determining matching fields. Default '=='.
+			engine (str, optional): Execution engine, vectorized or python. Default: vectorized.
+
+		Returns:
+			str: report of the parse and execute times and the execution path,
+				rows in and out and time of each predicate
+		'''
+		data = pd.read_json(self.data, orient='records')
+		report = self._interpreter.explain(string, data, field_operator=field_operator, engine=engine)
+		return format_explain(report)
 	# --------------------------------------------------------------------------
 
 	def send_order(self, instructions):
@@ -49,6 +49,15 @@ class ProbeCLI(Cmd):
 				print('No results found')
 			except:
 				print('Improper query')
+
+	def do_explain(self, arg):
+		if self._debug_mode:
+			print(self._api.explain(arg))
+		else:
+			try:
+				print(self._api.explain(arg))
+			except:
+				print('Improper query')
 	# --------------------------------------------------------------------------
 
 	def help_search(self):
@@ -111,6 +120,17 @@ class ProbeCLI(Cmd):
 		print('           cscontains,    cscont,  ~~  :  contains (case sensitive)')
 		print('   does not cscontain, csnotcont, !~~  :  does not contain (case sensitive)')
 
+	def help_explain(self):
+		print('')
+		print('Profile a spql query instead of running it.')
+		print('')
+		print('Reports the time spent parsing and executing the query and, for each')
+		print('query it is made of, the columns scanned, how each was scanned')
+		print('(indexed, vectorized or python), the rows tested and found and the')
+		print('time taken.')
+		print('')
+		print('         example: explain (name) contains (jupiter) & (priority) < (2501)')
+
 	def help_and(self):
 		print('')
 		print('The AND operator (&) is a means of chaining queries together.  It pipes the')
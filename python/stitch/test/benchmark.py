@@ -0,0 +1,104 @@
+from __future__ import with_statement, print_function, absolute_import
+from itertools import *
+from functools import *
+import time
+from collections import OrderedDict
+import numpy as np
+from pandas import DataFrame
+from stitch.core.stitch_frame import StitchFrame
+import stitch.core.utils as utils
+# ------------------------------------------------------------------------------
+
+'''
+.. module:: benchmark
+    :platform: Unix
+    :synopsis: Timings of StitchFrame methods against their per-cell equivalents
+
+.. moduleauthor:: Alex Braun <alexander.g.braun@gmail.com>
+'''
+
+def _log_table(rows):
+    '''Generates a DataFrame resembling a render log table'''
+    levels = np.array(['INFO', 'Warning', 'ERROR', 'debug'])
+    np.random.seed(0)
+    data = DataFrame({
+        'level': levels[np.random.randint(0, 4, rows)],
+        'message': ['frame %i rendered in %is' % (i, i % 97) for i in range(rows)],
+        'frame': np.arange(rows)
+    }, columns=['level', 'message', 'frame'])
+    return data
+
+def _time(func, data):
+    '''Returns the seconds taken to run func on a StitchFrame of data'''
+    sf = StitchFrame(data.copy())
+    start = time.time()
+    func(sf)
+    return time.time() - start
+
+def _report(name, vectorized, applymap):
+    print('{:>16} : {:>8.3f}s vectorized {:>8.3f}s applymap {:>6.1f}x'.format(
+        name, vectorized, applymap, applymap / max(vectorized, 1e-9)))
+# ------------------------------------------------------------------------------
+
+def regex_benchmark(rows=1000000):
+    '''Times the StitchFrame regex methods against applymap and utils'''
+    data = _log_table(rows)
+    cases = [
+        (
+            'regex_match',
+            lambda sf: sf.regex_match('(warning|error)', group=1, ignore_case=True),
+            lambda x: utils.regex_match('(warning|error)', x, group=1, ignore_case=True)
+        ),
+        (
+            'regex_search',
+            lambda sf: sf.regex_search(r'in (\d+)s', group=1),
+            lambda x: utils.regex_search(r'in (\d+)s', x, group=1)
+        ),
+        (
+            'regex_sub',
+            lambda sf: sf.regex_sub(r'\d+', '#'),
+            lambda x: utils.regex_sub(r'\d+', '#', x)
+        ),
+        (
+            'regex_split',
+            lambda sf: sf.regex_split(r'frame (\d+) rendered in (\d+)s'),
+            lambda x: utils.regex_split(r'frame (\d+) rendered in (\d+)s', x)
+        )
+    ]
+    for name, method, func in cases:
+        vectorized = _time(method, data)
+        applymap = _time(lambda sf: sf.applymap(func), data)
+        _report(name, vectorized, applymap)
+
+def coerce_nulls_benchmark(rows=250000):
+    '''Times StitchFrame.coerce_nulls against list membership on rows * 4 cells'''
+    np.random.seed(0)
+    items = np.empty(8, dtype=object)
+    items[:] = [None, '', [], {}, [None], ['a'], {'a': 1}, 'b']
+    data = DataFrame({
+        'name': np.where(np.random.rand(rows) < 0.1, '', 'joe'),
+        'age': np.random.randint(0, 100, rows),
+        'profession': items[np.random.randint(0, 8, rows)],
+        'notes': np.where(np.random.rand(rows) < 0.1, None, 'note')
+    }, columns=['name', 'age', 'profession', 'notes'])
+
+    # the membership test coerce_nulls used to run on every item
+    nulls = [   None,      '',      [],      {},      (),      set(),      OrderedDict(),
+               [None],    [''],    [[]],    [{}],    [()],    [set()],    [OrderedDict()],
+               (None),    (''),    ([]),    ({}),    (()),    (set()),    (OrderedDict()),
+                       set(''), set([]), set({}), set(()), set(set()), set(OrderedDict())
+    ]
+    func = lambda x: np.nan if x in nulls else x
+
+    vectorized = _time(lambda sf: sf.coerce_nulls(), data)
+    applymap = _time(lambda sf: sf.applymap(func), data)
+    _report('coerce_nulls', vectorized, applymap)
+# ------------------------------------------------------------------------------
+
+def main():
+    regex_benchmark()
+    coerce_nulls_benchmark()
+# ------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,15 @@ from __future__ import with_statement, print_function, absolute_import
 from itertools import *
 from functools import *
 import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
 from stitch.core.stitch_frame import StitchFrame
+from stitch.core.stitch_interpreter import StitchInterpreter
+from stitch.core.errors import NotFound
+import stitch.core.utils as utils
 from stitch.core.stitch_string import StitchString
 # ------------------------------------------------------------------------------
 
@@ -45,8 +53,71 @@ _DATA = [
     [4,5,6],
     [7,8,9]
 ]
+
+_PEOPLE = [
+    ['abe',    15, 'failed'],
+    ['carla',  22, 'complete'],
+    ['jack',   57, 'failed'],
+    ['Jill',   34, 'running'],
+    ['sue',    61, 'complete']
+]
+_PEOPLE_COLUMNS = ['name', 'age', 'status']
+
+_QUERIES = [
+    '(name) contains (jupiter)',
+    '(name) notcont (scratch, test)',
+    '(priority) < (2501)',
+    '(name) contains (jupiter) | (name) notcont (scratch, test) | (priority) < (2501)',
+    '(status) is (failed) & (priority) >= (100) | (user) IS NOT (root)',
+    '(a b, c) ~~ ("x y ", 1.5, 1e5)',
+    '(a)=(1)&(b)!~~(x)|(c)>=(3)',
+    '(a) = (1) (b) != (2)',
+    '(a) greater than equal to (1) & (b) less than (2) & (c) lte (3)',
+    '(a) does not contain (x) | (b) does not cscontain (y) | (c) cscont (z)',
+    '(a) ~ (\'(b)\') junk',
+    '(a) is (1) & (b)',
+    '(all) ~ (a&b, a|b, $x_)'
+]
 # ------------------------------------------------------------------------------
 
+def utils_regex_cache_001_test():
+    utils.clear_regex_cache()
+    for item in ['foo', 'bar', 'baz'] * 10:
+        utils.bool_test(item, 're.IGNORECASE', ['^b', 'z$'])
+    stats = utils.regex_cache_stats()
+    assert(stats['misses'] == 2)
+    assert(stats['hits'] == 38)
+    assert(stats['size'] == 2)
+
+def utils_nested_dict_001_test():
+    item = {'a': {'b1': {'c': 1}, 'b2': 0}, 'd': {}}
+    flat = utils.flatten_nested_dict(item)
+    assert(list(flat.items()) == [
+        ('a', 'null'), ('a_b1', 'null'), ('a_b1_c', 1), ('a_b2', 0), ('d', {})
+    ])
+    assert(utils.nested_dict_to_matrix(item, justify='right') == [
+        ['-->', '-->', 'a'],
+        ['-->', 'a', 'b1'],
+        ['a', 'b1', 'c'],
+        ['-->', 'a', 'b2'],
+        ['-->', '-->', 'd']
+    ])
+
+def utils_nested_dict_002_test():
+    matrix = [
+        ['a', 'b2', '-->', 0],
+        ['a', '-->', '-->', 'null'],
+        ['a', 'b1', 'c', 1],
+        ('d', '-->', '-->', 2)
+    ]
+    item = utils.matrix_to_nested_dict(iter(matrix))
+    assert(item == {'a': {'b1': {'c': 1}, 'b2': 0}, 'd': 2})
+
+    sf = StitchFrame()
+    sf.from_nested_dict(item)
+    assert(sf.to_nested_dict() == item)
+    assert(sf.to_hierarchical().to_nested_dict(index=True) == item)
+
 def frame_applymap_001_test():
     data = StitchFrame(_DATA)\
         .applymap(lambda x: 'test', columns=[0])\
@@ -66,6 +137,416 @@ def frame_flatten_001_test():
         [[1, 2, 3], [4, 5, 6], [7, 8, 9]], 'b3']
     )
 
+def frame_flatten_002_test():
+    data = DataFrame({
+        'foo': [{'a': 1, 'b': 10}, {'a': 2}, np.nan],
+        'bar': ['x', 'y', 'z'],
+        'baz': [[1, 2], 3.5, [4]]
+    }, columns=['foo', 'bar', 'baz'], index=[5, 6, 7])
+
+    result = StitchFrame(data.copy()).flatten().to_dataframe()
+    assert(result.columns.tolist() == ['foo_a', 'foo_b', 'bar', 'baz'])
+    assert(result.index.tolist() == [5, 6, 7])
+    assert(result['foo_a'].tolist()[:2] == [1, 2])
+    assert(result['bar'].dtype == object)
+
+    result = StitchFrame(data.copy()).flatten(dtype=[dict, list], drop=False).to_dataframe()
+    assert(result.columns.tolist() == ['foo', 'foo_a', 'foo_b', 'bar', 'baz', 'baz_0', 'baz_1'])
+    assert(result['baz_0'].tolist()[::2] == [1, 4])
+
+def frame_flatten_003_test():
+    expected = StitchFrame(_JSON)\
+        .flatten(prefix=False)\
+        .flatten()\
+        .flatten()\
+        .to_dataframe()
+    data = StitchFrame(_JSON)\
+        .flatten(prefix=False)\
+        .flatten(depth='all')\
+        .to_dataframe()
+    assert(data.columns.tolist() == expected.columns.tolist())
+    assert(data.iloc[0].tolist() == expected.iloc[0].tolist())
+
+    data = StitchFrame(_JSON).flatten(depth=2, dtype=[dict, list]).to_dataframe()
+    assert(data.columns.tolist() == ['0_a1_b1', '0_a2_b2', '0_a3'])
+
+def frame_stack_by_column_001_test():
+    data = DataFrame([
+        ['joe', 12], ['bill', 22], ['bill', 25], ['sue', 65], ['sue', 14], ['bill', 44]
+    ], columns=['name', 'age'])
+    data = StitchFrame(data).stack_by_column('name').to_dataframe()
+    assert(data.columns.tolist() == [('joe', 'age'), ('bill', 'age'), ('sue', 'age')])
+    assert(data.fillna(0).values.tolist() == [[12, 22, 65], [0, 25, 14], [0, 44, 0]])
+
+def frame_unstripe_001_test():
+    data = DataFrame([
+        ['joe', 'mechanic', 'bill', 'soldier', 'jane', 'teacher'],
+        ['sue', 'pilot', None, None, 'jack', 'nurse']
+    ], columns=['name', 'profession'] * 3)
+    for preallocate in [False, True]:
+        result = StitchFrame(data.copy()).unstripe(preallocate=preallocate).to_dataframe()
+        assert(result.columns.tolist() == ['name', 'profession'])
+        assert(result['name'].tolist() == ['joe', 'sue', 'bill', None, 'jane', 'jack'])
+
+def frame_concat_irregular_001_test():
+    x = DataFrame(np.arange(0, 9).reshape(3, 3), index=[7, 8, 9])
+    y = DataFrame(np.arange(100, 116).reshape(4, 4))
+    for preallocate in [False, True]:
+        result = StitchFrame().concat_irregular([x, y], axis=1, preallocate=preallocate).to_dataframe()
+        assert(result.shape == (4, 7))
+        assert(result.fillna(-1).values[:, 0].tolist() == [0, 3, 6, -1])
+
+def frame_merge_columns_001_test():
+    data = DataFrame([
+        ['john', 'jenkins', 'pilot', None],
+        ['harry', 'harmon', 'teacher', 'chemist']
+    ], columns=['first', 'last', 'job_1', 'job_2'])
+
+    result = StitchFrame(data.copy()).merge_columns(['first', 'last']).to_dataframe()
+    assert(result['first_last'].tolist() == ['johnjenkins', 'harryharmon'])
+
+    result = StitchFrame(data.copy())\
+        .merge_columns(['job_1', 'job_2'], new_column='jobs', iterables=True, drop=True)\
+        .to_dataframe()
+    assert(result.columns.tolist() == ['first', 'last', 'jobs'])
+    assert(result['jobs'].tolist() == [['pilot', None], ['teacher', 'chemist']])
+
+    func = lambda x: '/'.join(filter(None, x))
+    result = StitchFrame(data.copy())\
+        .merge_columns(['job_1', 'job_2'], func=func, new_column='jobs', raw=True)\
+        .to_dataframe()
+    expected = StitchFrame(data.copy())\
+        .merge_columns(['job_1', 'job_2'], func=lambda x: func(x.tolist()), new_column='jobs')\
+        .to_dataframe()
+    assert(result['jobs'].tolist() == expected['jobs'].tolist() == ['pilot', 'teacher/chemist'])
+
+def frame_from_walk_001_test():
+    root = tempfile.mkdtemp()
+    try:
+        for path in ['a/1', 'a/b/2', 'a/b/3', 'c/4', '5', 'a/.DS_Store']:
+            path = os.path.join(root, path)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('x' * 10)
+
+        data = StitchFrame().from_walk(root, threads=4, xattrs=False).to_dataframe()
+        assert('xattr' not in data.columns)
+        assert(sorted(data.filename.tolist()) == ['1', '2', '3', '4', '5'])
+        assert(data.stat.apply(lambda x: x['size']).tolist() == [10] * 5)
+
+        expected = [os.path.relpath(x, root) for x in data.fullpath.tolist()]
+        chunks = list(StitchFrame().iter_walk(root, chunk_size=2))
+        assert([len(x) for x in chunks] == [2, 2, 1])
+        data = pd.concat(chunks).fullpath.tolist()
+        assert([os.path.relpath(x, root) for x in data] == expected)
+    finally:
+        shutil.rmtree(root)
+
+def frame_from_walk_002_test():
+    root = tempfile.mkdtemp()
+    try:
+        source = os.path.join(root, 'source')
+        snapshot = os.path.join(root, 'snapshot.db')
+        for path in ['a/1', 'a/b/2', 'c/3']:
+            path = os.path.join(source, path)
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            open(path, 'w').close()
+
+        StitchFrame().from_walk(source, xattrs=False, snapshot=snapshot)
+        open(os.path.join(source, 'a', 'b', '4'), 'w').close()
+        os.remove(os.path.join(source, 'c', '3'))
+        # directory mtimes may not have changed within filesystem resolution
+        os.utime(os.path.join(source, 'a', 'b'), (0, 0))
+        os.utime(os.path.join(source, 'c'), (0, 0))
+
+        data = StitchFrame()\
+            .from_walk(source, xattrs=False, since=snapshot, snapshot=snapshot)\
+            .to_dataframe()
+        assert(sorted(data.filename.tolist()) == ['1', '2', '4'])
+
+        metadata, directories = utils.read_walk_snapshot(snapshot)
+        assert(metadata['source'] == source)
+        files = [x['filename'] for x in directories[os.path.join(source, 'a', 'b')]['files']]
+        assert(sorted(files) == ['2', '4'])
+
+        # xattr values are bytes, which are stored as base64 within JSON
+        snapshot = os.path.join(root, 'xattr.db')
+        directories = {'/x': dict(mtime=1, dirs=[], files=[{'xattr': {'user.a': b'\x00\xff'}}])}
+        utils.write_walk_snapshot(snapshot, directories, {'source': '/x'})
+        assert(utils.read_walk_snapshot(snapshot) == ({'source': '/x'}, directories))
+    finally:
+        shutil.rmtree(root)
+
+def frame_get_revolutions_001_test():
+    data = DataFrame({
+        'shot': ['s01', 's02', None],
+        'layer': ['bg', 'fg', 'fx']
+    }, columns=['shot', 'layer'])
+
+    result = StitchFrame(data).get_revolutions().to_dataframe()
+    assert(result.values.tolist() == [
+        ['s01', 'bg'], ['s01', 'fg'], ['s01', 'fx'],
+        ['s02', 'bg'], ['s02', 'fg'], ['s02', 'fx']
+    ])
+
+    result = StitchFrame(data).get_revolutions(start='s01fx', stop='s02fg').to_dataframe()
+    assert(result.index.tolist() == [2, 3, 4])
+    assert(result.values.tolist() == [['s01', 'fx'], ['s02', 'bg'], ['s02', 'fg']])
+
+    result = StitchFrame(data).get_revolutions(start=4).to_dataframe()
+    assert(result.values.tolist() == [['s02', 'fg'], ['s02', 'fx']])
+
+    try:
+        StitchFrame(data).get_revolutions(stop='s03bg')
+        assert(False)
+    except NotFound:
+        pass
+
+def frame_coerce_nulls_001_test():
+    data = DataFrame({
+        'name': ['joe', 'bill', 'sue', ''],
+        'age': [12, (), 65, 43],
+        'profession': ['mechanic', {}, [{}], 'teacher'],
+        'notes': [[None], ['a'], None, [[None]]]
+    }, columns=['name', 'age', 'profession', 'notes'])
+
+    result = StitchFrame(data).coerce_nulls().to_dataframe()
+    assert(result.isnull().values.tolist() == [
+        [False, False, False, True],
+        [False, True, True, False],
+        [False, False, True, True],
+        [True, False, False, False]
+    ])
+    assert(result.loc[3, 'notes'] == [[None]])
+
+def frame_unique_001_test():
+    data = DataFrame({
+        'make': ['gmc', 'honda', 'fiat', 'gmc'],
+        'model': ['suv', 'suv', 'car', 'truck'],
+        'color': ['blue', 'blue', None, 'blue'],
+        'year': [2007, 2007, 2007, 1999]
+    }, columns=['make', 'model', 'color', 'year'])
+
+    result = StitchFrame(data).unique().to_dataframe()
+    assert(result.fillna('-').values.tolist() == [
+        ['gmc', 'suv', 'blue', 2007],
+        ['honda', 'car', '-', 1999],
+        ['fiat', 'truck', '-', '-']
+    ])
+    assert(result['year'].dtype == np.float64)
+    assert(StitchFrame(data).unique().to_dataframe()['make'].dtype == np.object_)
+    result = StitchFrame(data[['make', 'year']].iloc[2:]).unique().to_dataframe()
+    assert(result['year'].dtype == np.int64)
+
+    result = StitchFrame(data).nan_to_bottom(columns=['color']).to_dataframe()
+    assert(result['color'].fillna('-').tolist() == ['blue', 'blue', 'blue', '-'])
+    assert(result['make'].tolist() == data['make'].tolist())
+
+def frame_from_nested_dict_001_test():
+    item = {'a': {'b1': {'c': 1}, 'b2': 0}, 'd': 2}
+    data = StitchFrame().from_nested_dict(item).to_dataframe()
+    assert(data.columns.tolist() == ['k000', 'k001', 'k002', 'v000'])
+    assert(data.index.tolist() == [0, 1, 2])
+    assert(data.values.tolist() == [
+        ['a', 'b1', 'c', 1],
+        ['a', 'b2', '-->', 0],
+        ['d', '-->', '-->', 2]
+    ])
+
+    data = StitchFrame().from_nested_dict(item, justify='right', hierarchical=True).to_dataframe()
+    assert(data.index.names == ['k000', 'k001', 'k002'])
+    assert(data.index.tolist() == [
+        ('a', 'b1', 'c'), ('-->', 'a', 'b2'), ('-->', '-->', 'd')
+    ])
+    assert(data['v000'].tolist() == [1, 0, 2])
+
+def frame_search_001_test():
+    query = '(name) is (abe) | (age) < (50) & (status) ~ (run, comp)'
+    results = []
+    for engine in ['vectorized', 'python']:
+        data = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+            .search(query, engine=engine)\
+            .to_dataframe().index.tolist()
+        results.append(data)
+    assert(results[0] == results[1] == [0, 1, 3])
+
+def frame_search_002_test():
+    data = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+        .search('(name) ~~ (J) | (status) !~ (a)')\
+        .to_dataframe().index.tolist()
+    assert(data == [1, 3, 4])
+
+def frame_search_003_test():
+    a = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)
+    b = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)
+    assert(a.last_search is None)
+    a.search('(age) > (30)')
+    b.search('(age) < (30)')
+    assert(a._interpreter is b._interpreter)
+    assert(a.last_search[0][0]['operator'] == '>')
+    assert(b.last_search[0][0]['operator'] == '<')
+
+def frame_search_004_test():
+    data = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS, index=[40, 10, 30, 20, 0])\
+        .search('(status) is (complete) | (age) > (50) & (status) ~ (fail)')\
+        .to_dataframe().index.tolist()
+    assert(data == [10, 30, 0])
+
+def frame_index_001_test():
+    sf = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+        .create_index('status')\
+        .create_index('age', kind='sorted')
+    query = '(status) is (complete, running) & (age) >= (34) | (age) < (20)'
+    data = sf.search(query, inplace=False).to_dataframe().index.tolist()
+    expected = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+        .search(query).to_dataframe().index.tolist()
+    assert(data == expected == [0, 3, 4])
+    assert(len(sf._indexes) == 2)
+
+    sf.search('(age) > (20)')
+    assert(sf._indexes == {})
+    sf.drop_index('age')
+    assert(sf.indexes == [('status', 'hash')])
+
+def frame_index_002_test():
+    sf = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+        .create_index('name', kind='ngram')\
+        .create_index('status', kind='ngram')
+    for query in ['(name) ~ (jil, jac)', '(status) ~~ (^comp)', '(status) ~ (fail|run)',
+                  '(name) ~ (ab)', '(status) ~ (completed?)', '(name) ~~ (jill)']:
+        data = sf.search(query, inplace=False).to_dataframe().index.tolist()
+        expected = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+            .search(query).to_dataframe().index.tolist()
+        assert(data == expected)
+
+    index = sf._get_indexes()['name'][0]
+    assert(index.lookup('re.IGNORECASE', ['jil']).tolist() == [3])
+    assert(index.lookup('re.IGNORECASE', ['ab']) is None)
+
+def frame_index_003_test():
+    sf = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS)\
+        .create_index('status')\
+        .create_index('name', kind='ngram')
+
+    # columns set through the StitchFrame are reindexed before they are searched
+    sf['status'] = ['complete', 'failed', 'complete', 'running', 'failed']
+    data = sf.search('(status) is (complete)', inplace=False).to_dataframe().index.tolist()
+    assert(data == [0, 2])
+
+    # columns edited in place are reindexed once invalidated
+    sf.to_dataframe().loc[1, 'status'] = 'complete'
+    sf.invalidate_index('status')
+    data = sf.search('(status) is (complete)', inplace=False).to_dataframe().index.tolist()
+    assert(data == [0, 1, 2])
+
+    # only the indexes of the columns a query tests are rebuilt
+    sf.search('(age) > (0)')
+    assert(sf._indexes == {})
+    sf.search('(status) is (complete)', inplace=False)
+    assert(list(sf._indexes.keys()) == [('status', 'hash')])
+
+def frame_explain_001_test():
+    sf = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS).create_index('status')
+    report = sf.explain('(status) is (failed) & (name) ~ (j) | (age) > (50)')
+    assert(report['rows_in'] == 5)
+    assert(report['rows_out'] == 2)
+    data = [(x['branch'], list(x['paths'].items()), x['rows_in'], x['rows_out']) for x in report['predicates']]
+    assert(data == [
+        (0, [('status', 'indexed')], 5, 2),
+        (0, [('name', 'vectorized')], 2, 1),
+        (1, [('age', 'vectorized')], 4, 1)
+    ])
+    assert(len(sf.to_dataframe()) == 5)
+
+def frame_dtype_001_test():
+    data = DataFrame({
+        'num': [1.256, np.nan, -2.5],
+        'str': ['FooBar', 'a.b c', ''],
+        'mix': ['HTTPServer', 3, None]
+    }, columns=['num', 'str', 'mix'])
+
+    result = StitchFrame(data.copy()).set_decimal_expansion(1).to_dataframe()
+    assert(result['num'].tolist()[::2] == [1.2, -2.5])
+    assert(result['str'].tolist() == data['str'].tolist())
+
+    result = StitchFrame(data.copy()).as_snakecase().to_dataframe()
+    assert(result['num'].tolist()[::2] == [1.256, -2.5])
+    assert(result['str'].tolist() == ['foo_bar', 'a_b_c', ''])
+    assert(result['mix'].tolist() == ['http_server', 3, None])
+
+    result = StitchFrame(data.copy()).is_iterable().to_dataframe()
+    assert(result.values.tolist() == [[False, True, True], [False, True, False], [False, True, False]])
+
+    result = StitchFrame(data.copy()).as_type(str, columns=['num']).to_dataframe()
+    assert(result['num'].tolist() == ['1.256', 'nan', '-2.5'])
+
+def frame_regex_001_test():
+    data = DataFrame({
+        'job': ['Airplane Mechanic', 'soldier', 'helicopter pilot'],
+        'age': [12, 22, 65],
+        'mix': ['airplane pilot', 3, None]
+    }, columns=['job', 'age', 'mix'])
+
+    result = StitchFrame(data.copy())\
+        .regex_search(r'(?P<vehicle>airplane|helicopter) (\w+)', group='vehicle', ignore_case=True)\
+        .to_dataframe()
+    assert(result.values.tolist() == [['Airplane', 12, 'airplane'], ['soldier', 22, 3], ['helicopter', 65, None]])
+
+    result = StitchFrame(data.copy()).regex_sub('[aeiou]', '', count=1).to_dataframe()
+    assert(result['job'].tolist() == ['Arplane Mechanic', 'sldier', 'hlicopter pilot'])
+
+    result = StitchFrame(data.copy()).regex_split(r'(\w+) (\w+)', columns=['job']).to_dataframe()
+    assert(result['job'].tolist() == [['Airplane', 'Mechanic'], 'soldier', ['helicopter', 'pilot']])
+
+    # numbered backreferences keep pointing at the groups they name
+    data = DataFrame({'code': ['xabbx', 'xabax', 'aba']})
+    result = StitchFrame(data.copy()).regex_search(r'(a)(b)\2', group=1).to_dataframe()
+    assert(result['code'].tolist() == ['a', 'xabax', 'aba'])
+
+    result = StitchFrame(data.copy()).regex_split(r'(a)(b)\2').to_dataframe()
+    assert(result['code'].tolist() == [['a', 'b'], 'xabax', 'aba'])
+
+def interpreter_cache_001_test():
+    interp = StitchInterpreter(cache_size=2)
+    for query in ['(a) is (1)', '(b) is (2)', '(a) is (1)', '(c) is (3)']:
+        interp.search(query)
+    stats = interp.cache_stats
+    assert(stats['hits'] == 1)
+    assert(stats['misses'] == 3)
+    assert(stats['evictions'] == 1)
+    assert(interp.last_search == [[{'fields': ['c'], 'operator': '==', 'values': [3.0]}]])
+
+def interpreter_columns_001_test():
+    interp = StitchInterpreter()
+    data = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS).to_dataframe()
+    for i in range(2):
+        columns = interp._get_columns(data, ['^a', 'us$'], field_operator='re')
+        assert(columns == ['age', 'status'])
+    assert(len(interp._column_cache) == 1)
+
+    data.columns = ['name', 'age_', 'stat']
+    columns = interp._get_columns(data, ['^a', 'us$'], field_operator='re')
+    assert(columns == ['age_'])
+
+def interpreter_engines_001_test():
+    # values with numbered backreferences cannot share one alternation
+    interp = StitchInterpreter()
+    data = StitchFrame(_PEOPLE, columns=_PEOPLE_COLUMNS).to_dataframe()
+    query = [[{'fields': ['name'], 'operator': 're', 'values': [r'(q)r', r'(l)\1']}]]
+    results = []
+    for engine in ['vectorized', 'python']:
+        result = interp.dataframe_query(data, engine=engine, query=query)
+        results.append(result.index.tolist())
+    assert(results[0] == results[1] == [3])
+
+def parser_conformance_001_test():
+    descent = StitchInterpreter(parser='descent', cache_size=0)
+    pyparsing = StitchInterpreter(parser='pyparsing', cache_size=0)
+    for query in _QUERIES:
+        assert(descent.search(query) == pyparsing.search(query))
+
 def string_parse_001_test():
     st = StitchString(_YAML)
     string = 'sceneHOUSE100.shot42_layer05.v001.exr'
@@ -77,9 +77,9 @@ class QubeBackingStore(BackingStore):
 			func=lambda x: create_complete_subids( x[x.index[0]], x[x.index[1]] ),
 			new_column='stdout_subids', iterables=True, inplace=True)
 
-		sdata._data['stdout'] = sdata._data['stdout_subids'].apply(lambda x: self._get_stdout_data(x))
+		sdata['stdout'] = sdata._data['stdout_subids'].apply(lambda x: self._get_stdout_data(x))
 		mask = sdata._data['stdout'].dropna()
-		sdata._data['stdout'] = sdata._data['stdout'].apply(lambda x: self._get_stdout_stats(x))
+		sdata['stdout'] = sdata._data['stdout'].apply(lambda x: self._get_stdout_stats(x))
 		sdata.flatten(columns=['stdout'], inplace=True)
 		data = sdata._data
 		return data